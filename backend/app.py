@@ -1,18 +1,55 @@
+import copy
+import json
+import math
 import os
+import queue
+import subprocess
+import sys
+import threading
+import time
 import uuid
-from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import cached_property
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, send_file
 from flask_cors import CORS
 from dotenv import load_dotenv
 from supabase import create_client
 
+try:
+    import msgpack
+except ImportError:  # optional: /api/snapshot falls back to JSON
+    msgpack = None
+
 from study_plan_data import TASK_CATEGORIES
 from project_data import COURSE_PROJECTS
+from search_index import INDEX_PATH as MATERIALS_INDEX_PATH, SearchIndex, index_path, search_all
+from retrieval import Retriever
+from llm import ChatHistoryStore, ResponseCache, build_messages, cache_key, context_fingerprint, make_client
+from jobs import JobCancelled, JobQueue
+import scheduler
+from stats import ProgressRollups
+from summarize import SummaryCache
+from xp import XpLedger
+from tenants import USER_HEADER, TenantCache, user_from_token, user_id_from
+from write_behind import WriteBehind
+import chat_history
+from chat_history import PAGE_MAX, RecentChats
+from calendar_feed import ALL as ALL_COURSES, CalendarFeed
+from reminders import RELOAD_SECONDS, LogSink, ReminderScheduler, SseSink, WebhookSink, claim_runner
+from uploads import (
+    HashingFile, UploadRequest, discard_uploads, material_type, resolve_material_path, store_upload, MATERIALS_DIR,
+)
 
 load_dotenv()
 
 app = Flask(__name__)
+app.request_class = UploadRequest
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_UPLOAD_MB", "512")) * 1024 * 1024
 CORS(app)
 
 supabase = create_client(
@@ -20,37 +57,335 @@ supabase = create_client(
     os.environ.get("SUPABASE_KEY"),
 )
 
+retriever = Retriever()
+llm_client = make_client()
+job_queue = JobQueue()
+# Toggles acknowledged from memory and flushed in batches; see write_behind.py for durability
+write_behind = WriteBehind(supabase) if os.environ.get("WRITE_BEHIND") == "1" else None
+# Set to require signed user tokens (tenants.sign_user) instead of trusting X-User-Id
+USER_TOKEN_SECRET = os.environ.get("USER_TOKEN_SECRET")
 
-# ─── Course Routes ───
+SEARCH_REFRESH_SECONDS = 60
+SEARCH_LIMIT_MAX = 50
+materials_search: SearchIndex | None = None
+materials_synced_at = 0.0
+materials_lock = threading.Lock()
+CHAT_RETENTION_DAYS = int(os.environ.get("CHAT_RETENTION_DAYS", chat_history.RETENTION_DAYS))
+REMINDER_TABLES = CALENDAR_TABLES = ("deadlines", "weeks", "study_tasks")
+REMINDER_HEARTBEAT_SECONDS = 15
+REMINDER_PAGE = 1000
 
 
-@app.route("/api/courses", methods=["GET"])
-def get_courses():
-    courses = supabase.table("courses").select("*").execute().data
-    weeks = supabase.table("weeks").select("*").execute().data
-    tasks = supabase.table("study_tasks").select("id,course_id,done").execute().data
+def load_reminders(scheduler: ReminderScheduler):
+    """Every student's upcoming rows, a page at a time; runs on the reminder thread at startup and periodically."""
+    today = date.today().isoformat()
+    for table in REMINDER_TABLES:
+        rows, start = [], 0
+        while True:
+            page = (
+                supabase.table(table).select("*").gte("date", today)
+                .order("user_id").order("id").range(start, start + REMINDER_PAGE - 1).execute().data
+            )
+            rows.extend(page)
+            if len(page) < REMINDER_PAGE:
+                break
+            start += REMINDER_PAGE
+        scheduler.sync(table, rows)
+
+
+reminder_stream = SseSink()
+reminders = None
+if os.environ.get("REMINDERS", "1") == "1":
+    # Every worker serves its own stream clients; one worker (REMINDER_RUNNER=1, or the
+    # first to take the lock file) also logs and posts webhooks, so those happen once
+    reminder_sinks = [reminder_stream]
+    runner = os.environ.get("REMINDER_RUNNER") or None
+    if runner == "1" or (runner is None and claim_runner()):
+        reminder_sinks.append(LogSink())
+        if os.environ.get("REMINDER_WEBHOOK_URL"):
+            reminder_sinks.append(WebhookSink(os.environ["REMINDER_WEBHOOK_URL"]))
+    reminders = ReminderScheduler(reminder_sinks).start(load_reminders, RELOAD_SECONDS)
+
+
+# ─── Tenancy ───
+# Every table has a user_id; the helpers below filter on it (leading column
+# of each table's indexes) and stamp it onto new rows.
+
+
+class TenantState:
+    """Caches derived from one student's rows."""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.rollups = ProgressRollups()
+        self.xp = XpLedger(supabase, user_id)
+        self.search_synced_at = 0.0
+        self.responses = ResponseCache(ChatHistoryStore(supabase, user_id))
+        self.milestones: dict[tuple[str, str], bool] = {}
+        self.calendar = CalendarFeed()
+        self.recent_chats = RecentChats(supabase, user_id)
+
+    @cached_property
+    def search(self) -> SearchIndex:
+        index = SearchIndex(index_path(self.user_id))
+        index.drop("file:")
+        return index
+
+
+tenants = TenantCache(TenantState)
+
+
+@app.before_request
+def resolve_user():
+    if USER_TOKEN_SECRET:
+        if request.method == "OPTIONS":
+            return  # CORS preflights carry no credentials
+        # EventSource and calendar apps can't send headers, hence ?token=
+        auth = request.headers.get("Authorization", "")
+        token = auth.removeprefix("Bearer ").strip() if auth.startswith("Bearer ") else request.args.get("token")
+        g.user_id = user_from_token(token, USER_TOKEN_SECRET)
+        if g.user_id is None:
+            return jsonify({"error": "Missing or invalid user token"}), 401
+        return
+    g.user_id = user_id_from(request.headers)
+    if g.user_id is None:
+        return jsonify({"error": f"Invalid {USER_HEADER} header"}), 400
+
+
+def tenant(user_id: str | None = None) -> TenantState:
+    return tenants.get(user_id or g.user_id)
+
+
+def select_rows(table: str, columns: str = "*", user_id: str | None = None):
+    return supabase.table(table).select(columns).eq("user_id", user_id or g.user_id)
+
+
+def update_rows(table: str, values: dict):
+    return supabase.table(table).update(values).eq("user_id", g.user_id)
+
+
+def delete_rows(table: str):
+    return supabase.table(table).delete().eq("user_id", g.user_id)
+
+
+def insert_rows(table: str, rows: dict | list[dict]):
+    rows = [{**row, "user_id": g.user_id} for row in (rows if isinstance(rows, list) else [rows])]
+    return supabase.table(table).insert(rows)
+
+
+def upsert_rows(table: str, rows: list[dict]):
+    return supabase.table(table).upsert([{**row, "user_id": g.user_id} for row in rows])
+
+
+def buffered(table: str, rows: list[dict], full_rows: bool = True) -> list[dict]:
+    """Rows as the write-behind view has them (unflushed toggles applied)."""
+    return write_behind.overlay(table, rows, full_rows) if write_behind else rows
+
+
+def settle(table: str, row_ids: list[str] | None = None):
+    """Call before writing a table around the write-behind buffer."""
+    if write_behind:
+        write_behind.settle(table, g.user_id, row_ids)
+
+
+def toggle_row(table: str, row_id: str, column: str) -> tuple[dict | None, dict | None]:
+    """Flip a boolean column; returns (old_row, new_row), or (None, None) if the row doesn't exist."""
+    old = write_behind.get(table, g.user_id, row_id) if write_behind else None
+    if old is None:
+        rows = select_rows(table).eq("id", row_id).execute().data
+        if not rows:
+            return None, None
+        old = rows[0]
+    if write_behind:
+        return old, write_behind.update(table, old, {column: not old[column]})
+    update_rows(table, {column: not old[column]}).eq("id", row_id).execute()
+    return old, select_rows(table).eq("id", row_id).execute().data[0]
+
+
+def rows_changed(table: str, rows: list[dict], deleted: list[str] = ()):
+    """Bring reminders and the calendar feed in line with rows just written or deleted."""
+    rows = [{**row, "user_id": g.user_id} for row in rows]
+    if reminders:
+        reminders.update(table, rows)
+        for row_id in deleted:
+            reminders.remove(table, g.user_id, row_id)
+    tenant().calendar.update(table, rows, deleted)
+
+
+def ensure_rollups(tasks: list[dict] | None = None, weeks: list[dict] | None = None) -> ProgressRollups:
+    """The student's progress rollups, loaded on first use and periodically after that.
+
+    Callers that already read the student's tasks and weeks pass them in to save the reload queries.
+    """
+    rollups = tenant().rollups
+    if rollups.stale():
+        if write_behind and tasks is None:
+            write_behind.flush()
+        rollups.load(
+            tasks if tasks is not None else
+            select_rows("study_tasks", "id,course_id,date,hours,category,done").execute().data,
+            weeks if weeks is not None else select_rows("weeks", "course_id,week_num,date").execute().data,
+        )
+    return rollups
+
+
+# ─── List Queries ───
+# List endpoints take ?fields=a,b (id is always returned) and the filters in
+# LIST_FILTERS; both go into the select, so only the asked-for rows and
+# columns leave the database.
+
+LIST_COLUMNS = {
+    "courses": {"id", "user_id", "name", "code", "instructor", "ta", "schedule", "venue", "color",
+                "assessment_json"},
+    "weeks": {"id", "user_id", "course_id", "week_num", "date", "topic", "details", "has_lab", "lab_name",
+              "has_quiz", "quiz_name", "status"},
+    "deadlines": {"id", "user_id", "course_id", "title", "date", "weight", "type", "done"},
+    "study_tasks": {"id", "user_id", "date", "course_id", "title", "hours", "category", "done"},
+    "materials": {"id", "user_id", "course_id", "week", "title", "type", "xp", "file_path", "file_name", "url",
+                  "size", "sha256", "completed", "created_at"},
+}
+# Query parameter -> column, per table
+LIST_FILTERS = {
+    "courses": {"course_id": "id"},
+    "deadlines": {"course_id": "course_id", "done": "done"},
+    "study_tasks": {"course_id": "course_id", "done": "done", "category": "category"},
+    "materials": {"course_id": "course_id", "week": "week", "done": "completed"},
+}
+BOOLEANS = {"true": True, "1": True, "false": False, "0": False}
+
+
+class QueryError(ValueError):
+    """Malformed query string or request body; answered with a 400."""
+
+
+@app.errorhandler(QueryError)
+def query_error(e):
+    return jsonify({"error": str(e)}), 400
+
+
+def parse_number(value, name: str, kind=float, low: float | None = None, high: float | None = None):
+    """kind(value), or QueryError if it isn't a finite number within [low, high]."""
+    try:
+        number = kind(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"Invalid {name}: {value}") from None
+    if not math.isfinite(number) or (low is not None and number < low) or (high is not None and number > high):
+        raise QueryError(f"Invalid {name}: {value}")
+    return number
+
+
+def parse_date(value, name: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"Invalid {name}: {value}") from None
+
+
+def requested_fields(allowed: set[str]) -> set[str] | None:
+    """The ?fields= set, None when absent (all fields)."""
+    raw = request.args.get("fields", "")
+    if not raw.strip():
+        return None
+    fields = {f.strip() for f in raw.split(",") if f.strip()}
+    unknown = sorted(fields - allowed)
+    if unknown:
+        raise QueryError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def list_filters(table: str) -> dict:
+    """The table's filters present in the query string, as {column: value}."""
+    filters = {}
+    for param, column in LIST_FILTERS[table].items():
+        value = request.args.get(param, "")
+        if not value:
+            continue
+        try:
+            filters[column] = BOOLEANS[value.lower()] if column in ("done", "completed") else (
+                int(value) if column == "week" else value)
+        except (KeyError, ValueError):
+            raise QueryError(f"Invalid {param}: {value}") from None
+    return filters
+
+
+def select_list(table: str, fields: set[str] | None, needs: set[str] = frozenset()):
+    """select_rows with only the columns fields and needs use, and the request's filters applied."""
+    columns = "*" if fields is None else ",".join(sorted({"id", "user_id", *needs, *(fields & LIST_COLUMNS[table])}))
+    query = select_rows(table, columns)
+    filters = list_filters(table)
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    if write_behind and "done" in filters:
+        write_behind.flush()  # otherwise a pending toggle could put a row on the wrong side of the filter
+    return query
 
+
+def project(rows: list[dict], fields: set[str] | None) -> list[dict]:
+    if fields is None:
+        return rows
+    keep = fields | {"id"}
+    return [{k: v for k, v in row.items() if k in keep} for row in rows]
+
+
+# ─── Course Routes ───
+
+
+def course_summaries(courses: list[dict], weeks: list[dict], rollups: ProgressRollups | None) -> list[dict]:
+    """Courses with their weeks and task counts (without rollups, no counts); weeks must be ordered by
+    (course_id, week_num)."""
+    weeks_by_course = {cid: list(rows) for cid, rows in groupby(weeks, key=itemgetter("course_id"))}
     result = []
     for c in courses:
-        c["assessment"] = __import__("json").loads(c["assessment_json"]) if c.get("assessment_json") else {}
-        c_weeks = [w for w in weeks if w["course_id"] == c["id"]]
-        c["weeks"] = sorted(c_weeks, key=lambda w: w["week_num"])
-        c["total_weeks"] = len([w for w in c_weeks if w.get("status") != "holiday"])
-        c_tasks = [t for t in tasks if t["course_id"] == c["id"]]
-        c["total_tasks"] = len(c_tasks)
-        c["completed_tasks"] = len([t for t in c_tasks if t["done"]])
+        c["assessment"] = json.loads(c["assessment_json"]) if c.get("assessment_json") else {}
+        c["weeks"] = c_weeks = weeks_by_course.get(c["id"], [])
+        c["total_weeks"] = sum(1 for w in c_weeks if w.get("status") != "holiday")
+        if rollups is not None:
+            counts = rollups.course_counts(c["id"])
+            c["total_tasks"] = counts.tasks
+            c["completed_tasks"] = counts.completed_tasks
         result.append(c)
-    return jsonify(result)
+    return result
+
+
+COURSE_FIELDS = LIST_COLUMNS["courses"] | {"assessment", "weeks", "total_weeks", "total_tasks", "completed_tasks"} | {
+    f"weeks.{column}" for column in LIST_COLUMNS["weeks"]
+}
+
+
+@app.route("/api/courses", methods=["GET"])
+def get_courses():
+    """?fields= may name week columns as weeks.<column>; weeks are only read if some week field is asked for."""
+    fields = requested_fields(COURSE_FIELDS)
+    courses = select_list("courses", fields, {"assessment_json"} if fields and "assessment" in fields else set())
+    courses = courses.execute().data
+    week_fields = None if fields is None else {f.split(".", 1)[1] for f in fields if f.startswith("weeks.")}
+    weeks = []
+    if fields is None or week_fields or fields & {"weeks", "total_weeks"}:
+        week_columns = "*"
+        if fields is not None and "weeks" not in fields:
+            week_columns = ",".join(sorted(week_fields | {"course_id", "status"}))
+        # Ordered in SQL (weeks_user_course_week_idx), so grouping is one pass with no sorting
+        weeks = select_rows("weeks", week_columns)
+        if "id" in list_filters("courses"):
+            weeks = weeks.eq("course_id", list_filters("courses")["id"])
+        weeks = weeks.order("course_id").order("week_num").execute().data
+    wants_counts = fields is None or bool(fields & {"total_tasks", "completed_tasks"})
+    result = course_summaries(courses, weeks, ensure_rollups() if wants_counts else None)
+    if week_fields and "weeks" not in fields:
+        fields = fields | {"weeks"}
+        for c in result:
+            c["weeks"] = project(c["weeks"], week_fields)
+    return jsonify(project(result, fields))
 
 
 @app.route("/api/course/<course_id>", methods=["GET"])
 def get_course(course_id):
-    rows = supabase.table("courses").select("*").eq("id", course_id).execute().data
+    rows = select_rows("courses").eq("id", course_id).execute().data
     if not rows:
         return jsonify({"error": "Course not found"}), 404
     c = rows[0]
-    c["assessment"] = __import__("json").loads(c["assessment_json"]) if c.get("assessment_json") else {}
-    weeks = supabase.table("weeks").select("*").eq("course_id", course_id).order("week_num").execute().data
+    c["assessment"] = json.loads(c["assessment_json"]) if c.get("assessment_json") else {}
+    weeks = select_rows("weeks").eq("course_id", course_id).order("week_num").execute().data
     c["weeks"] = weeks
     c["total_weeks"] = len([w for w in weeks if w.get("status") != "holiday"])
     return jsonify(c)
@@ -59,9 +394,21 @@ def get_course(course_id):
 # ─── Project Routes ───
 
 
+def student_project(course_id: str) -> dict | None:
+    """The course project with this student's milestone toggles applied."""
+    project = COURSE_PROJECTS.get(course_id)
+    if not project:
+        return None
+    project = copy.deepcopy(project)
+    done = tenant().milestones
+    for m in project["milestones"]:
+        m["done"] = done.get((course_id, m["id"]), m["done"])
+    return project
+
+
 @app.route("/api/project/<course_id>", methods=["GET"])
 def get_project(course_id):
-    project = COURSE_PROJECTS.get(course_id)
+    project = student_project(course_id)
     if not project:
         return jsonify({"error": "No project data for this course"}), 404
     return jsonify(project)
@@ -75,16 +422,16 @@ def toggle_milestone(course_id, milestone_id):
     milestone = next((m for m in project["milestones"] if m["id"] == milestone_id), None)
     if not milestone:
         return jsonify({"error": "Milestone not found"}), 404
-    milestone["done"] = not milestone["done"]
-    return jsonify(milestone)
+    done = tenant().milestones
+    key = (course_id, milestone_id)
+    done[key] = not done.get(key, milestone["done"])
+    return jsonify({**milestone, "done": done[key]})
 
 
 # ─── Deadline Routes ───
 
 
-@app.route("/api/deadlines", methods=["GET"])
-def get_deadlines():
-    deadlines = supabase.table("deadlines").select("*").order("date").execute().data
+def with_urgency(deadlines: list[dict]) -> list[dict]:
     today_str = date.today().isoformat()
     result = []
     for d in deadlines:
@@ -101,37 +448,88 @@ def get_deadlines():
             else:
                 d["urgency"] = "future"
         result.append(d)
-    return jsonify(result)
+    return result
+
+
+@app.route("/api/deadlines", methods=["GET"])
+def get_deadlines():
+    fields = requested_fields(LIST_COLUMNS["deadlines"] | {"urgency"})
+    urgency = fields is None or "urgency" in fields
+    rows = select_list("deadlines", fields, {"date", "done"} if urgency else set()).order("date").execute().data
+    rows = buffered("deadlines", rows, full_rows=fields is None)
+    return jsonify(project(with_urgency(rows) if urgency else rows, fields))
 
 
 @app.route("/api/deadlines/<deadline_id>/toggle", methods=["PATCH"])
 def toggle_deadline(deadline_id):
-    rows = supabase.table("deadlines").select("*").eq("id", deadline_id).execute().data
-    if not rows:
+    _, updated = toggle_row("deadlines", deadline_id, "done")
+    if updated is None:
         return jsonify({"error": "Not found"}), 404
-    new_done = not rows[0]["done"]
-    supabase.table("deadlines").update({"done": new_done}).eq("id", deadline_id).execute()
-    updated = supabase.table("deadlines").select("*").eq("id", deadline_id).execute().data[0]
+    rows_changed("deadlines", [updated])
     return jsonify(updated)
 
 
+# ─── Reminders ───
+
+
+@app.route("/api/reminders", methods=["GET"])
+def get_reminders():
+    if reminders is None:
+        return jsonify({"enabled": False, "reminders": []})
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), 500))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    return jsonify({"enabled": True, "reminders": reminders.upcoming(g.user_id, limit)})
+
+
+@app.route("/api/reminders/stream", methods=["GET"])
+def stream_reminders():
+    """Server-sent events: one `reminder` event per reminder as it fires."""
+    user_id = g.user_id
+    q = reminder_stream.subscribe(user_id)
+
+    def events():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    reminder = q.get(timeout=REMINDER_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: reminder\ndata: {json.dumps(reminder)}\n\n"
+        finally:
+            reminder_stream.unsubscribe(user_id, q)
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 # ─── Study Tasks ───
 
 
 @app.route("/api/study-tasks", methods=["GET"])
 def get_study_tasks():
-    tasks = supabase.table("study_tasks").select("*").order("date").execute().data
+    fields = requested_fields(LIST_COLUMNS["study_tasks"])
+    tasks = select_list("study_tasks", fields).order("date").execute().data
+    tasks = project(buffered("study_tasks", tasks, full_rows=fields is None), fields)
     return jsonify({"tasks": tasks, "categories": TASK_CATEGORIES})
 
 
+@app.route("/api/write-behind/stats", methods=["GET"])
+def write_behind_stats():
+    if write_behind is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **write_behind.stats()})
+
+
 @app.route("/api/study-tasks/<task_id>/toggle", methods=["PATCH"])
 def toggle_study_task(task_id):
-    rows = supabase.table("study_tasks").select("*").eq("id", task_id).execute().data
-    if not rows:
+    old, updated = toggle_row("study_tasks", task_id, "done")
+    if updated is None:
         return jsonify({"error": "Not found"}), 404
-    new_done = not rows[0]["done"]
-    supabase.table("study_tasks").update({"done": new_done}).eq("id", task_id).execute()
-    updated = supabase.table("study_tasks").select("*").eq("id", task_id).execute().data[0]
+    tenant().rollups.replace(old, updated)
+    rows_changed("study_tasks", [updated])
     return jsonify(updated)
 
 
@@ -140,20 +538,25 @@ def add_study_task():
     body = request.json
     task = {
         "id": str(uuid.uuid4()),
-        "date": body.get("date"),
+        "date": parse_date(body.get("date"), "date").isoformat(),
         "course_id": body.get("course_id", ""),
         "title": body.get("title", ""),
-        "hours": body.get("hours", 1),
+        "hours": parse_number(body.get("hours", 1), "hours", low=0, high=24),
         "category": body.get("category", "review"),
         "done": False,
     }
-    result = supabase.table("study_tasks").insert(task).execute()
+    result = insert_rows("study_tasks", task).execute()
+    state = tenant()
+    state.search.upsert_task(result.data[0])
+    state.rollups.replace(None, result.data[0])
+    rows_changed("study_tasks", result.data)
     return jsonify(result.data[0]), 201
 
 
 @app.route("/api/study-tasks/<task_id>", methods=["PATCH"])
 def update_study_task(task_id):
-    rows = supabase.table("study_tasks").select("*").eq("id", task_id).execute().data
+    settle("study_tasks", [task_id])
+    rows = select_rows("study_tasks").eq("id", task_id).execute().data
     if not rows:
         return jsonify({"error": "Not found"}), 404
     body = request.json
@@ -161,16 +564,634 @@ def update_study_task(task_id):
     for field in ("date", "title", "hours", "category", "course_id"):
         if field in body:
             updates[field] = body[field]
-    supabase.table("study_tasks").update(updates).eq("id", task_id).execute()
-    updated = supabase.table("study_tasks").select("*").eq("id", task_id).execute().data[0]
+    if "date" in updates:
+        updates["date"] = parse_date(updates["date"], "date").isoformat()
+    if "hours" in updates:
+        updates["hours"] = parse_number(updates["hours"], "hours", low=0, high=24)
+    update_rows("study_tasks", updates).eq("id", task_id).execute()
+    updated = select_rows("study_tasks").eq("id", task_id).execute().data[0]
+    state = tenant()
+    state.search.upsert_task(updated)
+    state.rollups.replace(rows[0], updated)
+    rows_changed("study_tasks", [updated])
     return jsonify(updated)
 
 
 @app.route("/api/study-tasks/<task_id>", methods=["DELETE"])
 def delete_study_task(task_id):
-    supabase.table("study_tasks").delete().eq("id", task_id).execute()
+    settle("study_tasks", [task_id])
+    deleted = delete_rows("study_tasks").eq("id", task_id).execute().data
+    state = tenant()
+    state.search.remove_task(task_id)
+    for row in deleted:
+        state.rollups.replace(row, None)
+    rows_changed("study_tasks", [], [task_id])
     return jsonify({"ok": True})
 
 
+# ─── Materials & XP ───
+
+
+@app.route("/api/materials/<material_id>/toggle", methods=["PATCH"])
+def toggle_material(material_id):
+    rows = select_rows("materials").eq("id", material_id).execute().data
+    if not rows:
+        return jsonify({"error": "Not found"}), 404
+    material = rows[0]
+    new_completed = not material["completed"]
+    # Compare-and-set on the old value, so concurrent toggles can't both award XP
+    flipped = (
+        update_rows("materials", {"completed": new_completed})
+        .eq("id", material_id).eq("completed", material["completed"]).execute().data
+    )
+    if not flipped:
+        return jsonify({"error": "Material was changed by another request, try again"}), 409
+    xp = material.get("xp") or 0
+    xp_ledger = tenant().xp
+    if new_completed:
+        xp_ledger.award(xp, "material_completed", material_id)
+    else:
+        xp_ledger.award(-xp, "material_uncompleted", material_id)
+    return jsonify({**flipped[0], "stats": xp_ledger.summary()})
+
+
+@app.route("/api/materials", methods=["GET"])
+def get_materials():
+    fields = requested_fields(LIST_COLUMNS["materials"])
+    rows = select_list("materials", fields).order("week").order("created_at").execute().data
+    return jsonify(project(rows, fields))
+
+
+@app.route("/api/materials", methods=["POST"])
+def upload_material():
+    """Add a material: a multipart `file` upload, a raw body with ?file_name=, or a video `url`.
+
+    File bytes are hashed and written to disk as they arrive (see uploads.py).
+    """
+    fields = request.form if request.mimetype == "multipart/form-data" else request.args
+    course_id = fields.get("course_id")
+    if not course_id:
+        return jsonify({"error": "course_id is required"}), 400
+    # Before a raw body is read; multipart files are discarded by cleanup_uploads
+    week = parse_number(fields.get("week") or 0, "week", int, low=0)
+    xp = parse_number(fields.get("xp") or 10, "xp", int, low=0, high=1000)
+
+    upload, file_name = None, None
+    if "file" in request.files:
+        storage = request.files["file"]
+        upload, file_name = storage.stream, storage.filename
+    elif request.mimetype == "application/octet-stream":
+        upload, file_name = HashingFile(), fields.get("file_name")
+        try:
+            while chunk := request.stream.read(1 << 20):
+                upload.write(chunk)
+        except BaseException:
+            upload.discard()
+            raise
+    url = fields.get("url")
+    if upload is None and not url:
+        return jsonify({"error": "Send a file or a url"}), 400
+
+    material = {
+        "id": str(uuid.uuid4()),
+        "course_id": course_id,
+        "week": week,
+        "title": fields.get("title") or file_name or url,
+        "type": fields.get("type") or ("video" if upload is None else material_type(file_name or "")),
+        "xp": xp,
+        "url": url,
+        "completed": False,
+        "created_at": date.today().isoformat(),
+    }
+    if upload is not None:
+        if not file_name:
+            upload.discard()
+            return jsonify({"error": "file_name is required"}), 400
+        digest = upload.sha256.hexdigest()
+        existing = (
+            select_rows("materials")
+            .eq("course_id", course_id).eq("sha256", digest).execute().data
+        )
+        if existing:
+            upload.discard()
+            return jsonify(existing[0])
+        path, _ = store_upload(upload, course_id, file_name)
+        material.update({
+            "file_path": path.relative_to(MATERIALS_DIR).as_posix(),
+            "file_name": path.name,
+            "size": upload.size,
+            "sha256": digest,
+        })
+    result = insert_rows("materials", material).execute()
+    return jsonify(result.data[0]), 201
+
+
+@app.teardown_request
+def cleanup_uploads(exc):
+    # Only if the form was parsed; touching request.files would read the body now
+    if "files" in request.__dict__:
+        discard_uploads(request.files)
+
+
+@app.route("/api/materials/<material_id>/file", methods=["GET"])
+def download_material(material_id):
+    rows = select_rows("materials", "file_path,file_name").eq("id", material_id).execute().data
+    path = resolve_material_path(rows[0]["file_path"]) if rows else None
+    if path is None:
+        return jsonify({"error": "Not found"}), 404
+    # conditional=True gives ETag/Last-Modified and Range (206) handling; the
+    # file object goes to wsgi.file_wrapper, which servers map to sendfile()
+    return send_file(path, conditional=True, download_name=rows[0]["file_name"] or path.name)
+
+
+@app.route("/api/xp", methods=["GET"])
+def get_xp():
+    return jsonify(tenant().xp.summary())
+
+
+# ─── Dashboard Snapshot ───
+
+# Reads for one snapshot run side by side; each is a blocking HTTP call to Supabase
+snapshot_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="snapshot")
+
+
+def wants_msgpack() -> bool:
+    return msgpack is not None and request.accept_mimetypes.best_match(
+        ["application/json", "application/msgpack"]) == "application/msgpack"
+
+
+@app.route("/api/snapshot", methods=["GET"])
+def get_snapshot():
+    """Everything the dashboard needs for first paint in one response.
+
+    Each table is read once, concurrently. The study_tasks and weeks reads
+    also feed the progress rollups when those need reloading. Send
+    `Accept: application/msgpack` for a MessagePack body.
+    """
+    started = time.perf_counter()
+    user_id = g.user_id
+    reads = {
+        "courses": snapshot_pool.submit(lambda: select_rows("courses", user_id=user_id).execute().data),
+        "weeks": snapshot_pool.submit(
+            lambda: select_rows("weeks", user_id=user_id).order("course_id").order("week_num").execute().data),
+        "deadlines": snapshot_pool.submit(
+            lambda: select_rows("deadlines", user_id=user_id).order("date").execute().data),
+        "tasks": snapshot_pool.submit(
+            lambda: select_rows("study_tasks", user_id=user_id).order("date").execute().data),
+    }
+    data = {name: future.result() for name, future in reads.items()}
+    data["tasks"] = buffered("study_tasks", data["tasks"])
+    data["deadlines"] = buffered("deadlines", data["deadlines"])
+    rollups = ensure_rollups(data["tasks"], data["weeks"])
+    courses = course_summaries(data["courses"], data["weeks"], rollups)
+    payload = {
+        "courses": courses,
+        "deadlines": with_urgency(data["deadlines"]),
+        "tasks": data["tasks"],
+        "categories": TASK_CATEGORIES,
+        "projects": {c["id"]: p for c in courses if (p := student_project(c["id"]))},
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+    if wants_msgpack():
+        return app.response_class(msgpack.packb(payload), mimetype="application/msgpack")
+    return jsonify(payload)
+
+
+# ─── Progress Stats ───
+
+
+@app.route("/api/stats", methods=["GET"])
+def get_stats():
+    """Planned/completed hours by course, week, category and day, plus totals for ?from=&to=."""
+    start, end = (request.args.get(name) or None for name in ("from", "to"))
+    start = start and parse_date(start, "from").isoformat()
+    end = end and parse_date(end, "to").isoformat()
+    return jsonify(ensure_rollups().snapshot(request.args.get("course_id") or None, start, end))
+
+
+# ─── Calendar Feeds ───
+# Calendar apps can't send headers, so the feeds also take the student as ?user=
+# (or, with USER_TOKEN_SECRET set, only as ?token=).
+
+
+def calendar_response(course_id: str):
+    by_param = "user" in request.args and not USER_TOKEN_SECRET
+    user_id = user_id_from({USER_HEADER: request.args["user"]}) if by_param else g.user_id
+    if user_id is None:
+        return jsonify({"error": "Invalid user"}), 400
+    feed = tenant(user_id).calendar
+    if feed.stale():
+        courses, *rows = snapshot_pool.map(
+            lambda table: select_rows(table, user_id=user_id).execute().data, ("courses", *CALENDAR_TABLES),
+        )
+        tables = dict(zip(CALENDAR_TABLES, rows))
+        for table in ("deadlines", "study_tasks"):
+            tables[table] = buffered(table, tables[table])
+        feed.load(courses, tables)
+    if course_id != ALL_COURSES and course_id not in feed.course_codes:
+        return jsonify({"error": "Course not found"}), 404
+    body, etag = feed.feed(course_id)
+    response = Response(body, mimetype="text/calendar")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, max-age=60"
+    return response.make_conditional(request)
+
+
+@app.route("/api/calendar.ics", methods=["GET"])
+def calendar_all():
+    return calendar_response(ALL_COURSES)
+
+
+@app.route("/api/calendar/<course_id>.ics", methods=["GET"])
+def calendar_course(course_id):
+    return calendar_response(course_id)
+
+
+# ─── Study Plan Scheduling ───
+
+
+def plan_from_request(body: dict) -> dict:
+    if write_behind:
+        write_behind.flush()
+    start = parse_date(body["start"], "start") if body.get("start") else date.today()
+    daily_hours = parse_number(body.get("daily_hours", 4), "daily_hours", low=0.5, high=24)
+    class_hours = parse_number(body.get("class_hours", 3), "class_hours", low=0, high=24)
+    tasks = select_rows("study_tasks", "id,date,course_id,title,hours,category,done").execute().data
+    deadlines = select_rows("deadlines", "course_id,date,done").execute().data
+    weeks = select_rows("weeks", "course_id,date,has_quiz,status").execute().data
+    return scheduler.plan(tasks, deadlines, weeks, daily_hours=daily_hours, start=start, class_hours=class_hours)
+
+
+def parse_moves(moves) -> dict[str, str]:
+    """{task id: ISO date} from a preview's moves list."""
+    if not isinstance(moves, list):
+        raise QueryError("moves must be a list")
+    new_dates = {}
+    for move in moves:
+        if not isinstance(move, dict) or not isinstance(move.get("id"), str):
+            raise QueryError(f"Invalid move: {move}")
+        new_dates[move["id"]] = parse_date(move.get("to"), "move date").isoformat()
+    return new_dates
+
+
+@app.route("/api/schedule/preview", methods=["POST"])
+def preview_schedule():
+    started = time.perf_counter()
+    result = plan_from_request(request.json or {})
+    result["took_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(result)
+
+
+@app.route("/api/schedule/apply", methods=["POST"])
+def apply_schedule():
+    """Apply the moves the user previewed, or replan from the given parameters if none are sent."""
+    body = request.json or {}
+    moves = body.get("moves")
+    if moves is None:
+        moves = plan_from_request(body)["moves"]
+    new_dates = parse_moves(moves)
+    if not new_dates:
+        return jsonify({"applied": 0, "tasks": []})
+
+    settle("study_tasks", list(new_dates))
+    rows = select_rows("study_tasks").in_("id", list(new_dates)).execute().data
+    movable = {row["id"] for row in rows if not row.get("done")}
+    rejected = sorted(set(new_dates) - movable)
+    if rejected:
+        return jsonify({"error": "Not an open task", "ids": rejected}), 400
+    old_rows = {row["id"]: dict(row) for row in rows}
+    for row in rows:
+        row["date"] = new_dates[row["id"]]
+    updated = upsert_rows("study_tasks", rows).execute().data
+    state = tenant()
+    for row in updated:
+        state.search.upsert_task(row)
+        state.rollups.replace(old_rows.get(row["id"]), row)
+    rows_changed("study_tasks", updated)
+    return jsonify({"applied": len(updated), "tasks": updated})
+
+
+# ─── Search ───
+
+
+def materials_index() -> SearchIndex:
+    """The shared materials index, resynced at most once per SEARCH_REFRESH_SECONDS for all students."""
+    global materials_search, materials_synced_at
+    with materials_lock:
+        if materials_search is None:
+            materials_search = SearchIndex(MATERIALS_INDEX_PATH)
+            # Weeks and tasks indexed here before students had their own index
+            materials_search.drop("week:")
+            materials_search.drop("task:")
+        stale = time.monotonic() - materials_synced_at >= SEARCH_REFRESH_SECONDS
+        if stale:
+            materials_synced_at = time.monotonic()
+    if stale:
+        materials_search.sync_files()
+    return materials_search
+
+
+def refresh_search_index() -> list[SearchIndex]:
+    """The shared materials index and the student's own, each resynced at most once per SEARCH_REFRESH_SECONDS."""
+    state = tenant()
+    if time.monotonic() - state.search_synced_at >= SEARCH_REFRESH_SECONDS:
+        state.search_synced_at = time.monotonic()
+        state.search.sync_weeks(select_rows("weeks", "course_id,week_num,topic,details").execute().data)
+        state.search.sync_tasks(select_rows("study_tasks", "id,course_id,title,date").execute().data)
+    return [materials_index(), state.search]
+
+
+@app.route("/api/search", methods=["GET"])
+def search():
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "Missing query"}), 400
+    limit = min(parse_number(request.args.get("limit", 20), "limit", int, low=1), SEARCH_LIMIT_MAX)
+    indexes = refresh_search_index()
+    start = time.perf_counter()
+    results = search_all(indexes, q, request.args.get("course_id") or None, limit)
+    return jsonify({"query": q, "results": results, "took_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+
+# ─── Summaries ───
+
+summaries = SummaryCache()
+
+
+def extracted_text_path(path: Path) -> Path:
+    """Where read_pdf.py writes a file's text (read_pdf.output_path)."""
+    return path.with_name(f"{path.stem if path.suffix.lower() == '.pdf' else path.name}_extracted.txt")
+
+
+def week_summary(user_id: str, week: dict) -> dict:
+    """Extractive summary of the week's extracted materials, one per source and one combined.
+
+    Weeks with no extracted uploads fall back to the retrieved material closest to the week's topic.
+    """
+    course_id, week_num = week["course_id"], week["week_num"]
+    materials = (
+        select_rows("materials", "title,file_path", user_id)
+        .eq("course_id", course_id).eq("week", week_num).execute().data
+    )
+    texts: dict[str, str] = {}
+    for row in materials:
+        path = resolve_material_path(row["file_path"])
+        if path and extracted_text_path(path).is_file():
+            texts[row["title"] or path.name] = extracted_text_path(path).read_text(encoding="utf-8", errors="replace")
+    if not texts:
+        chunks = retrieve(f"{week['topic']} {week.get('details') or ''}", course_id, 12, user_id)
+        for c in chunks:
+            texts[c["source"]] = f"{texts.get(c['source'], '')}\n\n{c['text']}"
+
+    sources = []
+    for source, text in texts.items():
+        summary, cached = summaries.summarize(text)
+        sources.append({"source": source, "summary": summary, "cached": cached,
+                        "input_chars": len(text), "summary_chars": len(summary)})
+    combined = "\n".join(s["summary"] for s in sources)
+    if len(sources) > 1:
+        combined, _ = summaries.summarize(combined)
+    return {
+        "course_id": course_id, "week": week_num, "topic": week["topic"], "summary": combined,
+        "sources": sources, "input_chars": sum(s["input_chars"] for s in sources), "summary_chars": len(combined),
+    }
+
+
+@app.route("/api/course/<course_id>/week/<int:week_num>/summary", methods=["GET"])
+def get_week_summary(course_id, week_num):
+    started = time.perf_counter()
+    week = get_week(g.user_id, course_id, week_num)
+    if not week:
+        return jsonify({"error": "Week not found"}), 404
+    result = week_summary(g.user_id, week)
+    result["took_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(result)
+
+
+@app.route("/api/summaries/stats", methods=["GET"])
+def summary_stats():
+    return jsonify(summaries.stats())
+
+
+# ─── AI Context ───
+
+
+def retrieve(question: str, course_id: str | None, k: int, user_id: str | None = None) -> list[dict]:
+    """Top-k chunks from one of the student's courses, or from all of them plus course-less material."""
+    courses = {c["id"] for c in select_rows("courses", "id", user_id).execute().data}
+    return retriever.top_k(question, {course_id} & courses if course_id else courses | {""}, k)
+
+
+@app.route("/api/context", methods=["GET"])
+def get_context():
+    """Top-k chunks of extracted material for a question, for building small AI prompts."""
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "Missing query"}), 400
+    k = min(request.args.get("k", 5, type=int), 20)
+    start = time.perf_counter()
+    chunks = retrieve(q, request.args.get("course_id") or None, k)
+    return jsonify({"query": q, "chunks": chunks, "took_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+
+def ask_ai(message: str, course_id: str | None, chunks: list[dict],
+           response_cache: ResponseCache) -> tuple[str, bool, str]:
+    """Answer through the response cache; returns (reply, served_from_cache, cache_key)."""
+    key = cache_key(message, course_id, context_fingerprint(chunks))
+    reply = response_cache.get(key)
+    if reply is not None:
+        return reply, True, key
+    reply = llm_client.complete(build_messages(message, chunks))
+    response_cache.put(key, reply)
+    return reply, False, key
+
+
+@app.route("/api/chat", methods=["POST"])
+def chat():
+    body = request.json or {}
+    message = (body.get("message") or "").strip()
+    if not message:
+        return jsonify({"error": "Missing message"}), 400
+    course_id = body.get("course_id") or None
+
+    chunks = retrieve(message, course_id, 4)
+    response_cache = tenant().responses
+    reply, cached, key = ask_ai(message, course_id, chunks, response_cache)
+    row = response_cache.store.save(course_id, message, reply, key)
+    tenant().recent_chats.add(row)
+    return jsonify({**row, "cached": cached, "sources": sorted({c["source"] for c in chunks})})
+
+
+@app.route("/api/chat/history", methods=["GET"])
+def get_chat_history():
+    """Newest first. ?course_id= (empty for general chat; absent for all courses), ?limit=, ?cursor=."""
+    course_id = request.args.get("course_id")
+    cursor = request.args.get("cursor") or None
+    limit = min(parse_number(request.args.get("limit", 20), "limit", int, low=1), PAGE_MAX)
+    page = None
+    if course_id is not None and cursor is None:
+        page = tenant().recent_chats.page(course_id, limit)
+    if page is None:
+        try:
+            page = chat_history.history_page(supabase, g.user_id, course_id, limit, cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    messages, next_cursor = page
+    return jsonify({"messages": messages, "next_cursor": next_cursor})
+
+
+@app.route("/api/chat/archives", methods=["GET"])
+def get_chat_archives():
+    return jsonify(chat_history.list_archives(supabase, g.user_id, request.args.get("course_id")))
+
+
+@app.route("/api/chat/archives/<archive_id>", methods=["GET"])
+def get_chat_archive(archive_id):
+    archive = chat_history.read_archive(supabase, g.user_id, archive_id)
+    if archive is None:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(archive)
+
+
+@app.route("/api/chat/cache-stats", methods=["GET"])
+def chat_cache_stats():
+    return jsonify(tenant().responses.stats())
+
+
+# ─── Background Jobs ───
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+# read_pdf.py lives at the repo root; appended so it can't shadow backend modules
+sys.path.append(str(REPO_ROOT))
+
+
+def get_week(user_id: str, course_id: str, week_num: int) -> dict | None:
+    rows = (
+        select_rows("weeks", "course_id,week_num,topic,details", user_id)
+        .eq("course_id", course_id).eq("week_num", week_num).execute().data
+    )
+    return rows[0] if rows else None
+
+
+def run_extract_pdfs(job):
+    import read_pdf
+
+    dirs = [(REPO_ROOT / d).resolve() for d in job.params.get("dirs", [])]
+    if any(not d.is_relative_to(REPO_ROOT) for d in dirs):
+        raise ValueError("dirs must be inside the project")
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(int(job.params.get("workers") or cpus), cpus))
+    return read_pdf.extract_batch(
+        dirs or read_pdf.DEFAULT_DIRS, workers,
+        force=bool(job.params.get("force")),
+        progress=lambda done, total: job.progress(done / total, f"{done}/{total} files"),
+    )
+
+
+MOODLE_SCRIPT = Path(__file__).resolve().parent / "moodle_download.py"
+MOODLE_SUMMARY = Path(__file__).resolve().parent / "data" / "moodle_summary.json"
+
+
+def run_moodle_sync(job):
+    """Run moodle_download.py in its own process: it opens a browser and waits up to 5 minutes for the login."""
+    job.progress(0.0, "Waiting for Moodle login in the browser window")
+    started = time.time()
+    proc = subprocess.Popen([sys.executable, str(MOODLE_SCRIPT)], cwd=MOODLE_SCRIPT.parent,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while proc.poll() is None:
+            job.check()
+            time.sleep(1)
+    except JobCancelled:
+        proc.terminate()
+        proc.wait()
+        raise
+    if proc.returncode != 0:
+        raise RuntimeError(f"moodle_download.py exited with {proc.returncode}; see data/moodle_download.log")
+    # No summary from this run means it timed out waiting for the login or found no courses
+    fresh = MOODLE_SUMMARY.exists() and MOODLE_SUMMARY.stat().st_mtime >= started
+    return {"materials_dir": str(MATERIALS_DIR), "summary": json.loads(MOODLE_SUMMARY.read_text()) if fresh else None}
+
+
+def run_week_prompt(job, prompt: str, summarized: bool = False) -> dict:
+    """Ask about a week with retrieved chunks as context, or its local summaries if summarized."""
+    course_id, week_num = job.params.get("course_id"), int(job.params.get("week", 0))
+    week = get_week(job.user_id, course_id, week_num)
+    if not week:
+        raise ValueError(f"No week {week_num} for course {course_id}")
+    if summarized:
+        summary = week_summary(job.user_id, week)
+        chunks = [{"source": s["source"], "text": s["summary"]} for s in summary["sources"] if s["summary"]]
+        job.progress(0.3, f"Summarized {summary['input_chars']} chars of material to "
+                          f"{sum(len(c['text']) for c in chunks)}")
+    else:
+        chunks = retrieve(f"{week['topic']} {week.get('details') or ''}", course_id, 6, job.user_id)
+        job.progress(0.3, "Retrieved course material")
+    message = prompt.format(week=week_num, topic=week["topic"], details=week.get("details") or "")
+    reply, cached, _ = ask_ai(message, course_id, chunks, tenant(job.user_id).responses)
+    return {"course_id": course_id, "week": week_num, "text": reply, "cached": cached,
+            "sources": sorted({c["source"] for c in chunks})}
+
+
+def run_summarize(job):
+    return run_week_prompt(
+        job, "Summarize the key points of week {week}: {topic} ({details}) for revision.", summarized=True,
+    )
+
+
+def run_quiz(job):
+    n = int(job.params.get("questions", 5))
+    return run_week_prompt(
+        job, f"Write {n} multiple-choice practice questions with answers on week {{week}}: {{topic}} ({{details}})."
+    )
+
+
+def run_compact_chat(job):
+    days = int(job.params.get("days") or CHAT_RETENTION_DAYS)
+    job.progress(0.1, f"Archiving chat history older than {days} days")
+    result = chat_history.compact(supabase, job.user_id, datetime.now() - timedelta(days=days))
+    tenant(job.user_id).recent_chats.clear()
+    return {"days": days, **result}
+
+
+job_queue.register("extract_pdfs", run_extract_pdfs, limit=1)
+job_queue.register("compact_chat", run_compact_chat, limit=1)
+job_queue.register("moodle_sync", run_moodle_sync, limit=1)
+job_queue.register("summarize", run_summarize, limit=2)
+job_queue.register("quiz", run_quiz, limit=2)
+
+
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    body = request.json or {}
+    try:
+        job = job_queue.submit(body.get("type", ""), body.get("params") or {}, g.user_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(job), 202
+
+
+@app.route("/api/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify(job_queue.recent(request.args.get("status"), request.args.get("limit", 50, type=int), g.user_id))
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job or job["user_id"] != g.user_id:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(job)
+
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = job_queue.get(job_id)
+    if not job or job["user_id"] != g.user_id:
+        return jsonify({"error": "Not found"}), 404
+    job = job_queue.cancel(job_id)
+    return jsonify(job)
+
+
 if __name__ == "__main__":
     app.run(debug=True, port=5001)
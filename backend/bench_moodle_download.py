@@ -0,0 +1,96 @@
+"""
+Offline throughput benchmark for moodle_download.py.
+
+Usage:
+    python bench_moodle_download.py [--courses 3] [--files 20] [--large-mb 20] [--json]
+
+Starts fake_moodle.py in-process, points the downloader at it and runs course
+discovery plus every course download into a temporary directory with a
+headless browser. Reports files/s, MB/s and peak RSS (this process and the
+browser processes it spawned), plus the downloader's own run summary.
+"""
+
+import argparse
+import json
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from playwright.sync_api import sync_playwright
+
+import fake_moodle
+import moodle_download
+
+
+def peak_rss_mb(who: int) -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run(args) -> dict:
+    site = fake_moodle.site_from_args(args)
+    server = fake_moodle.serve(site)
+    moodle_download.MOODLE_URL = f"http://127.0.0.1:{server.server_port}"
+    expected = sum(c.file_count for c in site.values())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        start = time.perf_counter()
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            context = browser.new_context(accept_downloads=True)
+            page = context.new_page()
+            courses = moodle_download.discover_courses(page)
+            discovered = time.perf_counter()
+            stats = moodle_download.RunStats(events_path=None)
+            downloaded = sum(
+                moodle_download.download_course_materials(page, context, course, out_dir, stats)
+                for course in courses
+            )
+            browser.close()
+        elapsed = time.perf_counter() - start
+        total_bytes = sum(f.stat().st_size for f in out_dir.rglob("*") if f.is_file())
+
+    server.shutdown()
+    return {
+        "courses": len(courses),
+        "files_expected": expected,
+        "files_downloaded": downloaded,
+        "bytes": total_bytes,
+        "seconds": round(elapsed, 3),
+        "discovery_seconds": round(discovered - start, 3),
+        "files_per_s": round(downloaded / elapsed, 2) if elapsed else 0.0,
+        "mb_per_s": round(total_bytes / (1024 * 1024) / elapsed, 2) if elapsed else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(resource.RUSAGE_SELF), 1),
+        "peak_child_rss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "run": stats.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    fake_moodle.add_site_arguments(parser)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    result = run(args)
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    print("=" * 50)
+    print(f"Courses:     {result['courses']}")
+    print(f"Files:       {result['files_downloaded']}/{result['files_expected']}")
+    print(f"Data:        {result['bytes'] / (1024 * 1024):.1f} MB in {result['seconds']:.2f}s "
+          f"(discovery {result['discovery_seconds']:.2f}s)")
+    print(f"Throughput:  {result['files_per_s']:.2f} files/s, {result['mb_per_s']:.2f} MB/s")
+    print(f"Retries:     {result['run']['retries']}  outcomes {result['run']['outcomes']}")
+    print(f"Peak RSS:    {result['peak_rss_mb']:.1f} MB (browser {result['peak_child_rss_mb']:.1f} MB)")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
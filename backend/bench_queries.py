@@ -0,0 +1,218 @@
+"""
+Query-plan and latency benchmark for the SQLite schema in database.py.
+
+Usage:
+    python bench_queries.py [--tasks 50000] [--courses 8] [--users 20] [--repeat 200] [--json]
+
+Builds two temporary databases with the same synthetic data, spread over
+--users students: "baseline" (primary keys only, rollback journal, default
+pragmas) and "tuned" (init_db(): tenant-leading composite indexes, WAL,
+pragmas, ANALYZE). For each query the
+app issues it prints SQLite's EXPLAIN QUERY PLAN and the median latency,
+then times single-row write transactions, which is where WAL and
+synchronous=NORMAL matter.
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from flask import Flask
+
+import database
+
+START = date(2026, 1, 12)
+CATEGORIES = ["review", "lab", "quiz-prep", "project", "reading", "attend", "deadline"]
+
+QUERIES = {
+    "tasks in date range": (
+        "SELECT * FROM study_tasks WHERE user_id = :user AND date BETWEEN :start AND :end ORDER BY date",
+        lambda r: {"user": r["user"], "start": r["day"], "end": r["day_plus_7"]},
+    ),
+    "tasks of course by date": (
+        "SELECT * FROM study_tasks WHERE user_id = :user AND course_id = :course ORDER BY date",
+        lambda r: {"user": r["user"], "course": r["course"]},
+    ),
+    "weeks of course": (
+        "SELECT * FROM weeks WHERE user_id = :user AND course_id = :course ORDER BY week_num",
+        lambda r: {"user": r["user"], "course": r["course"]},
+    ),
+    "upcoming deadlines": (
+        "SELECT * FROM deadlines WHERE user_id = :user AND date >= :start ORDER BY date LIMIT 20",
+        lambda r: {"user": r["user"], "start": r["day"]},
+    ),
+    "materials of course week": (
+        "SELECT * FROM materials WHERE user_id = :user AND course_id = :course AND week = :week",
+        lambda r: {"user": r["user"], "course": r["course"], "week": r["week"]},
+    ),
+    "chat cache lookup": (
+        "SELECT ai_reply FROM chat_history WHERE user_id = :user AND cache_key = :key AND timestamp >= :since "
+        "ORDER BY timestamp DESC LIMIT 1",
+        lambda r: {"user": r["user"], "key": r["key"], "since": r["day"]},
+    ),
+    "recent chat of course": (
+        "SELECT * FROM chat_history WHERE user_id = :user AND course_id = :course ORDER BY timestamp DESC LIMIT 20",
+        lambda r: {"user": r["user"], "course": r["course"]},
+    ),
+}
+
+
+def synthetic_rows(n_tasks: int, n_courses: int, n_users: int, rng: random.Random) -> dict:
+    users = [f"u{i}" for i in range(n_users)]
+    courses = [f"c{i}" for i in range(n_courses)]
+    days = [(START + timedelta(days=i)).isoformat() for i in range(120)]
+    rows = {
+        "courses": [(u, c, f"Course {c}", c.upper()) for u in users for c in courses],
+        "weeks": [
+            (u, c, n, (START + timedelta(weeks=n - 1)).isoformat()) for u in users for c in courses for n in range(1, 14)
+        ],
+        "study_tasks": [
+            (rng.choice(users), f"t{i}", rng.choice(days), rng.choice(courses), f"Task {i}",
+             rng.choice([0.5, 1, 1.5, 2]), rng.choice(CATEGORIES), rng.random() < 0.4)
+            for i in range(n_tasks)
+        ],
+        "deadlines": [
+            (rng.choice(users), f"d{i}", rng.choice(courses), f"Deadline {i}", rng.choice(days))
+            for i in range(n_tasks // 50)
+        ],
+        "materials": [
+            (rng.choice(users), f"m{i}", rng.choice(courses), rng.randint(1, 13), f"Material {i}", f"{i:064x}")
+            for i in range(n_tasks // 5)
+        ],
+        "chat_history": [
+            (rng.choice(users), f"h{i}", rng.choice(courses), f"{rng.choice(days)}T{rng.randint(0, 23):02d}:00:00",
+             f"{i:064x}")
+            for i in range(n_tasks // 2)
+        ],
+    }
+    return rows
+
+
+def load(path: Path, rows: dict):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany("INSERT INTO courses (user_id, id, name, code) VALUES (?, ?, ?, ?)", rows["courses"])
+        conn.executemany("INSERT INTO weeks (user_id, course_id, week_num, date) VALUES (?, ?, ?, ?)", rows["weeks"])
+        conn.executemany(
+            "INSERT INTO study_tasks (user_id, id, date, course_id, title, hours, category, done) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows["study_tasks"],
+        )
+        conn.executemany(
+            "INSERT INTO deadlines (user_id, id, course_id, title, date) VALUES (?, ?, ?, ?, ?)", rows["deadlines"]
+        )
+        conn.executemany(
+            "INSERT INTO materials (user_id, id, course_id, week, title, sha256) VALUES (?, ?, ?, ?, ?, ?)",
+            rows["materials"],
+        )
+        conn.executemany(
+            "INSERT INTO chat_history (user_id, id, course_id, timestamp, cache_key) VALUES (?, ?, ?, ?, ?)",
+            rows["chat_history"],
+        )
+    conn.close()
+
+
+def build(path: Path, rows: dict, tuned: bool):
+    app = Flask(__name__)
+    database.init_db(app, f"sqlite:///{path}")
+    with app.app_context():
+        database.db.engine.dispose()
+    if not tuned:
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_%'").fetchall():
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute("DROP TABLE IF EXISTS sqlite_stat1")
+        conn.commit()
+        conn.close()
+    load(path, rows)
+    if tuned:
+        conn = sqlite3.connect(path)
+        conn.execute("ANALYZE")
+        conn.close()
+
+
+def connect(path: Path, tuned: bool) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    if tuned:
+        for name, value in database.SQLITE_PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def bench_queries(conn: sqlite3.Connection, rows: dict, repeat: int, rng: random.Random) -> dict:
+    samples = []
+    for _ in range(repeat):
+        user, _, _, course, _ = (chat := rng.choice(rows["chat_history"]))
+        day = rng.choice(rows["study_tasks"])[2]
+        samples.append({
+            "user": user, "course": course, "week": rng.randint(1, 13), "key": chat[4], "day": day,
+            "day_plus_7": (date.fromisoformat(day) + timedelta(days=7)).isoformat(),
+        })
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params(samples[0]))]
+        timings = []
+        for sample in samples:
+            start = time.perf_counter()
+            conn.execute(sql, params(sample)).fetchall()
+            timings.append(time.perf_counter() - start)
+        results[name] = {"plan": plan, "median_ms": round(statistics.median(timings) * 1000, 3)}
+    return results
+
+
+def bench_writes(conn: sqlite3.Connection, rows: dict, n: int) -> float:
+    """Median ms per single-row transaction, like one toggle request."""
+    timings = []
+    for user, task_id, *_ in rows["study_tasks"][:n]:
+        start = time.perf_counter()
+        with conn:
+            conn.execute("UPDATE study_tasks SET done = NOT done WHERE user_id = ? AND id = ?", (user, task_id))
+        timings.append(time.perf_counter() - start)
+    return round(statistics.median(timings) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=50000)
+    parser.add_argument("--courses", type=int, default=8)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.tasks, args.courses, args.users, random.Random(0))
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for variant in ("baseline", "tuned"):
+            tuned = variant == "tuned"
+            path = Path(tmp) / f"{variant}.db"
+            build(path, rows, tuned)
+            conn = connect(path, tuned)
+            report[variant] = {
+                "queries": bench_queries(conn, rows, args.repeat, random.Random(1)),
+                "write_txn_ms": bench_writes(conn, rows, min(args.repeat, 200)),
+            }
+            conn.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for name in QUERIES:
+        print(name)
+        for variant in ("baseline", "tuned"):
+            q = report[variant]["queries"][name]
+            print(f"  {variant:<9}{q['median_ms']:>9.3f} ms  {' | '.join(q['plan'])}")
+    print("single-row write transaction")
+    for variant in ("baseline", "tuned"):
+        print(f"  {variant:<9}{report[variant]['write_txn_ms']:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
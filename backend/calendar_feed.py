@@ -0,0 +1,176 @@
+"""iCalendar (.ics) feeds of a student's deadlines, study tasks and class weeks.
+
+Each row becomes one VEVENT fragment, cached with the row fields it was
+built from. A full sync (on first use, then every REFRESH_SECONDS) and the
+write handlers both go through the same path, so only rows whose fields
+changed are re-rendered. Assembled feeds (overall and per course) and their
+ETags are cached until a fragment changes, so a poll that gets a 304 does no
+rendering and no queries.
+"""
+
+import hashlib
+import threading
+import time
+from datetime import date, timedelta
+
+REFRESH_SECONDS = 300
+PRODID = "-//StudyDash//Calendar Feed//EN"
+ALL = "*"
+
+# Row fields each fragment depends on; a row whose values are unchanged keeps its fragment
+FIELDS = {
+    "deadlines": ("course_id", "title", "date", "weight", "type", "done"),
+    "study_tasks": ("course_id", "title", "date", "hours", "category", "done"),
+    "weeks": ("course_id", "week_num", "date", "topic", "details", "has_lab", "lab_name", "has_quiz", "quiz_name"),
+}
+
+
+def escape(text) -> str:
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def fold(line: str) -> str:
+    """RFC 5545 line folding: at most 75 octets per line, continuations start with a space."""
+    data = line.encode()
+    if len(data) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:  # don't split a UTF-8 sequence
+            end -= 1
+        parts.append(data[start:end].decode())
+        start, limit = end, 74
+    return "\r\n ".join(parts)
+
+
+def row_key(table: str, row: dict) -> str:
+    return f"{row['course_id']}:{row['week_num']}" if table == "weeks" else str(row["id"])
+
+
+def render_event(table: str, row: dict, course_code: str) -> str | None:
+    """One VEVENT (all-day, on the row's date), or None for rows without a usable date."""
+    try:
+        day = date.fromisoformat(row["date"])
+    except (TypeError, ValueError):
+        return None
+    prefix = ("✓ " if row.get("done") else "") + (f"[{course_code}] " if course_code else "")
+    if table == "deadlines":
+        summary = prefix + row["title"]
+        description = ", ".join(str(v) for v in (row.get("type"), row.get("weight")) if v)
+    elif table == "study_tasks":
+        summary = prefix + row["title"]
+        description = f"{row.get('category') or 'study'} · {row.get('hours') or 0}h"
+    else:
+        summary = f"{prefix}Week {row['week_num']}: {row.get('topic') or ''}".rstrip(": ")
+        extras = [row.get("lab_name") or "Lab" if row.get("has_lab") else None,
+                  row.get("quiz_name") or "Quiz" if row.get("has_quiz") else None]
+        description = "\n".join(v for v in [", ".join(e for e in extras if e), row.get("details")] if v)
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{table}-{row_key(table, row)}@studydash",
+        f"DTSTAMP:{day:%Y%m%d}T000000Z",
+        f"DTSTART;VALUE=DATE:{day:%Y%m%d}",
+        f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}",
+        f"SUMMARY:{escape(summary)}",
+    ]
+    if description:
+        lines.append(f"DESCRIPTION:{escape(description)}")
+    lines.append("END:VEVENT")
+    return "\r\n".join(fold(line) for line in lines)
+
+
+class CalendarFeed:
+    """One student's cached event fragments and assembled feeds."""
+
+    def __init__(self, refresh_seconds: int = REFRESH_SECONDS):
+        self.lock = threading.Lock()
+        self.refresh_seconds = refresh_seconds
+        self.loaded_at = 0.0
+        self.course_codes: dict[str, str] = {}
+        # (table, key) -> (fields, course_id, sort key, fragment)
+        self.events: dict[tuple[str, str], tuple] = {}
+        # course_id or ALL -> (body, etag), dropped when one of its events changes
+        self.feeds: dict[str, tuple[str, str]] = {}
+        self.rendered = 0
+
+    def stale(self) -> bool:
+        return time.monotonic() - self.loaded_at > self.refresh_seconds
+
+    def loaded(self) -> bool:
+        return self.loaded_at > 0
+
+    def load(self, courses: list[dict], tables: dict[str, list[dict]]):
+        """Full sync; rows missing from tables are dropped, unchanged rows keep their fragments."""
+        with self.lock:
+            codes = {c["id"]: c.get("code") or "" for c in courses}
+            if codes != self.course_codes:
+                self.course_codes = codes
+                self.events.clear()
+                self.feeds.clear()
+            for table, rows in tables.items():
+                present = {row_key(table, row) for row in rows}
+                for key in [k for k in self.events if k[0] == table and k[1] not in present]:
+                    self._drop(key)
+                self._apply(table, rows)
+            self.loaded_at = time.monotonic()
+
+    def update(self, table: str, rows: list[dict], deleted: list[str] = ()):
+        """Fold in rows just written (and keys just deleted); a no-op until the first load."""
+        with self.lock:
+            if not self.loaded():
+                return
+            self._apply(table, rows)
+            for row_id in deleted:
+                self._drop((table, row_id))
+
+    def feed(self, course_id: str = ALL) -> tuple[str, str]:
+        """(ics body, etag) for one course or ALL."""
+        with self.lock:
+            cached = self.feeds.get(course_id)
+            if cached is not None:
+                return cached
+            events = sorted(
+                (sort_key, fragment) for (_, course, sort_key, fragment) in self.events.values()
+                if course_id == ALL or course == course_id
+            )
+            name = "StudyDash" if course_id == ALL else f"StudyDash {self.course_codes.get(course_id, course_id)}"
+            body = "\r\n".join([
+                "BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN",
+                fold(f"X-WR-CALNAME:{escape(name)}"),
+                *(fragment for _, fragment in events),
+                "END:VCALENDAR",
+            ]) + "\r\n"
+            etag = hashlib.sha1(body.encode()).hexdigest()
+            self.feeds[course_id] = (body, etag)
+            return body, etag
+
+    # ─── Internals (caller holds self.lock) ───
+
+    def _apply(self, table: str, rows: list[dict]):
+        names = FIELDS[table]
+        for row in rows:
+            key = (table, row_key(table, row))
+            fields = tuple(row.get(name) for name in names)
+            current = self.events.get(key)
+            if current is not None and current[0] == fields:
+                continue
+            fragment = render_event(table, row, self.course_codes.get(row["course_id"], ""))
+            self.rendered += 1
+            if fragment is None:
+                self._drop(key)
+                continue
+            if current is not None:
+                self._invalidate(current[1])
+            self.events[key] = (fields, row["course_id"], (row["date"], table, key[1]), fragment)
+            self._invalidate(row["course_id"])
+
+    def _drop(self, key: tuple[str, str]):
+        current = self.events.pop(key, None)
+        if current is not None:
+            self._invalidate(current[1])
+
+    def _invalidate(self, course_id: str):
+        self.feeds.pop(course_id, None)
+        self.feeds.pop(ALL, None)
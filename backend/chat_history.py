@@ -0,0 +1,200 @@
+"""Chat history paging, a per-course recent-exchange index, and retention compaction.
+
+History is paged newest first with an opaque keyset cursor over (timestamp,
+id), so page n costs the same as page 1 on the (user_id, course_id,
+timestamp) index. RecentChats keeps each course's last RECENT_PER_COURSE
+exchanges in a deque. First pages and recent-context lookups come from
+there: one query per course when first used, then appends.
+
+compact() moves exchanges older than the retention window into
+chat_archive. Each archive row holds one course-month as zlib-compressed
+JSON; exchanges for a course-month that already has a row (from an earlier
+batch or run) are merged into it by id. Archives are written before the
+originals are deleted, so a crash part-way can leave an exchange in both
+places but never in neither, and the next run merges it in only once.
+"""
+
+import base64
+import json
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+from tenants import DEFAULT_USER
+
+RETENTION_DAYS = 90
+RECENT_PER_COURSE = 50
+RECENT_RELOAD_SECONDS = 300
+PAGE_MAX = 100
+COMPACT_BATCH = 1000
+# Ids per delete request; each id adds ~40 bytes to the URL, which proxies cap at a few KB
+DELETE_BATCH = 100
+HISTORY_COLUMNS = "id,course_id,user_message,ai_reply,timestamp"
+ARCHIVE_COLUMNS = "id,course_id,period,first_timestamp,last_timestamp,message_count,raw_bytes,compressed_bytes"
+# Key for exchanges not tied to a course (course_id is null)
+GENERAL = ""
+
+
+def order_key(row: dict) -> tuple[str, str]:
+    return row["timestamp"], row["id"]
+
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["timestamp"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Raises ValueError for anything encode_cursor didn't produce."""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor") from None
+    if not isinstance(timestamp, str) or not isinstance(row_id, str):
+        raise ValueError("Invalid cursor")
+    return timestamp, row_id
+
+
+def history_page(supabase, user_id: str, course_id: str | None, limit: int,
+                 cursor: str | None = None) -> tuple[list[dict], str | None]:
+    """One page of exchanges, newest first, and the cursor of the next page (None on the last).
+
+    course_id None pages every course; GENERAL pages exchanges without one.
+    """
+    query = supabase.table("chat_history").select(HISTORY_COLUMNS).eq("user_id", user_id)
+    if course_id == GENERAL:
+        query = query.is_("course_id", "null")
+    elif course_id is not None:
+        query = query.eq("course_id", course_id)
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.or_(f'timestamp.lt."{timestamp}",and(timestamp.eq."{timestamp}",id.lt."{row_id}")')
+    rows = query.order("timestamp", desc=True).order("id", desc=True).limit(limit + 1).execute().data
+    return rows[:limit], encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+
+
+class RecentChats:
+    """One student's last RECENT_PER_COURSE exchanges per course, oldest to newest in a deque."""
+
+    def __init__(self, supabase, user_id: str = DEFAULT_USER, size: int = RECENT_PER_COURSE,
+                 reload_seconds: int = RECENT_RELOAD_SECONDS):
+        self.supabase = supabase
+        self.user_id = user_id
+        self.size = size
+        self.reload_seconds = reload_seconds
+        self.lock = threading.Lock()
+        self.courses: dict[str, tuple[deque, float]] = {}
+
+    def recent(self, course_id: str, n: int) -> list[dict]:
+        """Up to n exchanges, newest first; n must be at most size."""
+        with self.lock:
+            entry = self.courses.get(course_id)
+        if entry is None or time.monotonic() - entry[1] > self.reload_seconds:
+            rows, _ = history_page(self.supabase, self.user_id, course_id, self.size)
+            entry = (deque(reversed(rows), maxlen=self.size), time.monotonic())
+            with self.lock:
+                self.courses[course_id] = entry
+        with self.lock:
+            return list(islice(reversed(entry[0]), n))
+
+    def page(self, course_id: str, limit: int) -> tuple[list[dict], str | None] | None:
+        """First page from the index, or None if limit is too large to tell whether more exist."""
+        if limit >= self.size:
+            return None
+        rows = self.recent(course_id, limit + 1)
+        return rows[:limit], encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+
+    def add(self, row: dict):
+        """Append a just-saved exchange; courses not loaded yet will read it on first use."""
+        with self.lock:
+            entry = self.courses.get(row["course_id"] or GENERAL)
+            if entry is None:
+                return
+            rows = entry[0]
+            rows.append({k: row.get(k) for k in HISTORY_COLUMNS.split(",")})
+            # Timestamps have second resolution; keep ties in the (timestamp, id) order cursors assume
+            if len(rows) > 1 and order_key(rows[-2]) > order_key(rows[-1]):
+                ordered = sorted(rows, key=order_key)
+                rows.clear()
+                rows.extend(ordered)
+
+    def clear(self):
+        with self.lock:
+            self.courses.clear()
+
+
+# ─── Retention ───
+
+
+def compact(supabase, user_id: str, before: datetime) -> dict:
+    """Archive one student's exchanges older than before, one archive row per course and month."""
+    cutoff = before.isoformat(timespec="seconds")
+    totals = {"messages": 0, "archives": 0, "raw_bytes": 0, "compressed_bytes": 0}
+    while True:
+        rows = (
+            supabase.table("chat_history").select(f"{HISTORY_COLUMNS},cache_key")
+            .eq("user_id", user_id).lt("timestamp", cutoff)
+            .order("course_id").order("timestamp").limit(COMPACT_BATCH).execute().data
+        )
+        if not rows:
+            return totals
+        groups: dict[tuple, list[dict]] = {}
+        for row in rows:
+            groups.setdefault((row["course_id"], row["timestamp"][:7]), []).append(row)
+        existing = {
+            (a["course_id"], a["period"]): a
+            for a in supabase.table("chat_archive").select("id,course_id,period,blob")
+            .eq("user_id", user_id).in_("period", sorted({period for _, period in groups})).execute().data
+        }
+        archives = []
+        for (course_id, period), messages in groups.items():
+            current = existing.get((course_id, period))
+            if current is not None:
+                merged = {m["id"]: m for m in decode_blob(current["blob"])}
+                merged.update((m["id"], m) for m in messages)
+                messages = sorted(merged.values(), key=order_key)
+            raw = json.dumps(messages, separators=(",", ":")).encode()
+            blob = base64.b64encode(zlib.compress(raw, 9)).decode()
+            archives.append({
+                "id": current["id"] if current else str(uuid.uuid4()), "user_id": user_id,
+                "course_id": course_id, "period": period,
+                "first_timestamp": messages[0]["timestamp"], "last_timestamp": messages[-1]["timestamp"],
+                "message_count": len(messages), "raw_bytes": len(raw), "compressed_bytes": len(blob), "blob": blob,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+            })
+        supabase.table("chat_archive").upsert(archives).execute()
+        ids = [r["id"] for r in rows]
+        for i in range(0, len(ids), DELETE_BATCH):
+            supabase.table("chat_history").delete().eq("user_id", user_id).in_("id", ids[i:i + DELETE_BATCH]).execute()
+        totals["messages"] += len(rows)
+        totals["archives"] += sum(1 for key in groups if key not in existing)
+        totals["raw_bytes"] += sum(a["raw_bytes"] for a in archives)
+        totals["compressed_bytes"] += sum(a["compressed_bytes"] for a in archives)
+
+
+def decode_blob(blob: str) -> list[dict]:
+    return json.loads(zlib.decompress(base64.b64decode(blob)))
+
+
+def list_archives(supabase, user_id: str, course_id: str | None = None) -> list[dict]:
+    query = supabase.table("chat_archive").select(ARCHIVE_COLUMNS).eq("user_id", user_id)
+    if course_id is not None:
+        query = query.eq("course_id", course_id) if course_id != GENERAL else query.is_("course_id", "null")
+    return query.order("last_timestamp", desc=True).execute().data
+
+
+def read_archive(supabase, user_id: str, archive_id: str) -> dict | None:
+    """An archive's metadata plus its exchanges, newest first."""
+    rows = (
+        supabase.table("chat_archive").select(f"{ARCHIVE_COLUMNS},blob")
+        .eq("user_id", user_id).eq("id", archive_id).execute().data
+    )
+    if not rows:
+        return None
+    archive = rows[0]
+    messages = decode_blob(archive.pop("blob"))
+    return {**archive, "messages": messages[::-1]}
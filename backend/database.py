@@ -1,16 +1,58 @@
-"""SQLite database models and initialization for StudyDash."""
+"""SQLite database models and initialization for StudyDash.
+
+The app itself reads and writes through Supabase (app.py); these models
+mirror that schema for local SQLite copies. init_db() and the migrations
+below run only where they are called explicitly: bench_queries.py and
+one-off scripts. SUPABASE.md has the matching Postgres DDL.
+
+Dates are ISO-8601 strings ("YYYY-MM-DD"), which sort and compare the same
+as the dates they encode, so the (…, date) indexes below serve ORDER BY date
+and date-range filters directly.
+"""
 
 import json
+import os
+import sqlite3
 from datetime import datetime
 from pathlib import Path
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
+
+from tenants import DEFAULT_USER
 
 db = SQLAlchemy()
 
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / "data" / "studydash.db"
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# single writer; synchronous=NORMAL is durable across app crashes under WAL
+# (only an OS crash can lose the last transactions).
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "busy_timeout": 5000,           # ms to wait on a locked database
+    "cache_size": -32000,           # negative = KiB, so ~32 MB page cache
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+def user_id_column(primary_key: bool = False):
+    """Owning student; leads the primary key or indexes of every table."""
+    return db.Column(
+        db.String(64), primary_key=primary_key, nullable=False,
+        default=DEFAULT_USER, server_default=DEFAULT_USER,
+    )
+
 
 class Course(db.Model):
     __tablename__ = "courses"
+    user_id = user_id_column(primary_key=True)
     id = db.Column(db.String(50), primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     code = db.Column(db.String(50), nullable=False)
@@ -21,7 +63,11 @@ class Course(db.Model):
     color = db.Column(db.String(20))
     assessment_json = db.Column(db.Text)
 
-    weeks = db.relationship("Week", backref="course", cascade="all, delete-orphan")
+    # Loaded for all courses of a query in one extra SELECT ... IN (...), already ordered
+    weeks = db.relationship(
+        "Week", backref="course", cascade="all, delete-orphan",
+        order_by="Week.week_num", lazy="selectin",
+    )
 
     @property
     def assessment(self):
@@ -33,14 +79,19 @@ class Course(db.Model):
             "instructor": self.instructor, "ta": self.ta,
             "schedule": self.schedule, "venue": self.venue,
             "color": self.color, "assessment": self.assessment,
-            "weeks": [w.to_dict() for w in sorted(self.weeks, key=lambda w: w.week_num)],
+            "weeks": [w.to_dict() for w in self.weeks],
         }
 
 
 class Week(db.Model):
     __tablename__ = "weeks"
+    __table_args__ = (
+        db.ForeignKeyConstraint(["user_id", "course_id"], ["courses.user_id", "courses.id"]),
+        db.Index("ix_weeks_user_course_week", "user_id", "course_id", "week_num", unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    course_id = db.Column(db.String(50), db.ForeignKey("courses.id"), nullable=False)
+    user_id = user_id_column()
+    course_id = db.Column(db.String(50), nullable=False)
     week_num = db.Column(db.Integer, nullable=False)
     date = db.Column(db.String(20))
     topic = db.Column(db.String(300))
@@ -52,20 +103,32 @@ class Week(db.Model):
     status = db.Column(db.String(20))
 
     def to_dict(self):
-        d = {
-            "week": self.week_num, "date": self.date, "topic": self.topic,
-            "details": self.details, "has_lab": self.has_lab, "has_quiz": self.has_quiz,
-            "status": self.status,
-        }
-        if self.lab_name:
-            d["lab_name"] = self.lab_name
-        if self.quiz_name:
-            d["quiz_name"] = self.quiz_name
-        return d
+        return week_dict(
+            self.week_num, self.date, self.topic, self.details, self.has_lab,
+            self.lab_name, self.has_quiz, self.quiz_name, self.status,
+        )
+
+
+def week_dict(week_num, date, topic, details, has_lab, lab_name, has_quiz, quiz_name, status) -> dict:
+    d = {
+        "week": week_num, "date": date, "topic": topic,
+        "details": details, "has_lab": has_lab, "has_quiz": has_quiz,
+        "status": status,
+    }
+    if lab_name:
+        d["lab_name"] = lab_name
+    if quiz_name:
+        d["quiz_name"] = quiz_name
+    return d
 
 
 class Deadline(db.Model):
     __tablename__ = "deadlines"
+    __table_args__ = (
+        db.Index("ix_deadlines_user_date", "user_id", "date"),
+        db.Index("ix_deadlines_user_course_date", "user_id", "course_id", "date"),
+    )
+    user_id = user_id_column(primary_key=True)
     id = db.Column(db.String(100), primary_key=True)
     course_id = db.Column(db.String(50), nullable=False)
     title = db.Column(db.String(300), nullable=False)
@@ -83,6 +146,11 @@ class Deadline(db.Model):
 
 class StudyTask(db.Model):
     __tablename__ = "study_tasks"
+    __table_args__ = (
+        db.Index("ix_study_tasks_user_date", "user_id", "date", "course_id"),
+        db.Index("ix_study_tasks_user_course_date", "user_id", "course_id", "date"),
+    )
+    user_id = user_id_column(primary_key=True)
     id = db.Column(db.String(100), primary_key=True)
     date = db.Column(db.String(20), nullable=False)
     course_id = db.Column(db.String(50))
@@ -101,7 +169,12 @@ class StudyTask(db.Model):
 
 class Material(db.Model):
     __tablename__ = "materials"
+    __table_args__ = (
+        db.Index("ix_materials_user_course_week", "user_id", "course_id", "week"),
+        db.Index("ix_materials_user_course_sha", "user_id", "course_id", "sha256"),
+    )
     id = db.Column(db.String(100), primary_key=True)
+    user_id = user_id_column()
     course_id = db.Column(db.String(50), nullable=False)
     week = db.Column(db.Integer, default=0)
     title = db.Column(db.String(300))
@@ -110,6 +183,8 @@ class Material(db.Model):
     file_path = db.Column(db.String(500))
     file_name = db.Column(db.String(300))
     url = db.Column(db.String(500))
+    size = db.Column(db.BigInteger)
+    sha256 = db.Column(db.String(64))
     completed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.String(50))
 
@@ -118,17 +193,25 @@ class Material(db.Model):
             "id": self.id, "course_id": self.course_id, "week": self.week,
             "title": self.title, "type": self.type, "xp": self.xp,
             "file_path": self.file_path, "file_name": self.file_name,
-            "url": self.url, "completed": self.completed, "created_at": self.created_at,
+            "url": self.url, "size": self.size, "sha256": self.sha256,
+            "completed": self.completed, "created_at": self.created_at,
         }
 
 
 class ChatHistory(db.Model):
     __tablename__ = "chat_history"
+    __table_args__ = (
+        db.Index("ix_chat_history_user_course_time", "user_id", "course_id", "timestamp"),
+        db.Index("ix_chat_history_user_cache_key", "user_id", "cache_key", "timestamp"),
+    )
     id = db.Column(db.String(100), primary_key=True)
+    user_id = user_id_column()
     course_id = db.Column(db.String(50))
     user_message = db.Column(db.Text)
     ai_reply = db.Column(db.Text)
     timestamp = db.Column(db.String(50))
+    # sha256 of normalised prompt + course + context, used by the AI response cache
+    cache_key = db.Column(db.String(64))
 
     def to_dict(self):
         return {
@@ -138,12 +221,247 @@ class ChatHistory(db.Model):
         }
 
 
+class ChatArchive(db.Model):
+    """A course-month of compacted chat_history rows as zlib-compressed JSON (chat_history.py)."""
+    __tablename__ = "chat_archive"
+    __table_args__ = (db.Index("ix_chat_archive_user_course_last", "user_id", "course_id", "last_timestamp"),)
+    id = db.Column(db.String(100), primary_key=True)
+    user_id = user_id_column()
+    course_id = db.Column(db.String(50))
+    period = db.Column(db.String(7))
+    first_timestamp = db.Column(db.String(50))
+    last_timestamp = db.Column(db.String(50))
+    message_count = db.Column(db.Integer)
+    raw_bytes = db.Column(db.Integer)
+    compressed_bytes = db.Column(db.Integer)
+    blob = db.Column(db.Text)
+    created_at = db.Column(db.String(50))
+
+
 class UserStats(db.Model):
+    """Legacy single-row XP total; XP now lives in XpLedger."""
     __tablename__ = "user_stats"
     id = db.Column(db.Integer, primary_key=True, default=1)
+    user_id = db.Column(db.String(64), unique=True, default=DEFAULT_USER, server_default=DEFAULT_USER)
     xp = db.Column(db.Integer, default=0)
 
 
+class XpLedger(db.Model):
+    """Append-only XP changes; the total is the sum of delta."""
+    __tablename__ = "xp_ledger"
+    __table_args__ = (
+        db.Index("ix_xp_ledger_user", "user_id", "id"),
+        db.Index("ix_xp_ledger_user_created", "user_id", "created_at"),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(50), nullable=False)
+    ref = db.Column(db.String(100))
+    created_at = db.Column(db.String(50))
+
+    def to_dict(self):
+        return {
+            "id": self.id, "delta": self.delta, "reason": self.reason,
+            "ref": self.ref, "created_at": self.created_at,
+        }
+
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_conn, _record):
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cursor = dbapi_conn.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+def engine_options(uri: str) -> dict:
+    """Pool settings for SQLALCHEMY_ENGINE_OPTIONS."""
+    if uri in ("sqlite://", "sqlite:///:memory:"):
+        # One shared connection, otherwise each checkout gets an empty database
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    if uri.startswith("sqlite"):
+        # Connections are cheap but reusing them keeps the page cache and mmap warm
+        return {"pool_size": 5, "max_overflow": 5, "connect_args": {"check_same_thread": False, "timeout": 5}}
+    return {"pool_size": 5, "max_overflow": 10, "pool_recycle": 300, "pool_pre_ping": True}
+
+
+def init_db(app, uri: str | None = None):
+    """Configure the engine from DATABASE_URL (else a local SQLite file), create tables and migrate."""
+    uri = uri or os.environ.get("DATABASE_URL") or f"sqlite:///{DEFAULT_DB_PATH}"
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://"):]
+    if uri.startswith("sqlite:///") and uri != "sqlite:///:memory:":
+        Path(uri[len("sqlite:///"):]).parent.mkdir(parents=True, exist_ok=True)
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(uri)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        migrate(db.engine)
+
+
+# ─── Migrations ───
+# Each step runs once, in order, and is recorded in schema_migrations. Steps
+# are idempotent so a database created by create_all() passes through them.
+
+
+def add_missing_columns(conn):
+    """ALTER TABLE ADD COLUMN for model columns an older database doesn't have yet."""
+    inspector = inspect(conn)
+    for table in db.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column.type.compile(dialect=conn.dialect)}'
+                if column.server_default is not None:
+                    ddl += f" DEFAULT '{column.server_default.arg}'"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                conn.execute(text(ddl))
+
+
+def drop_legacy_indexes(conn):
+    """Drop the old single-column index=True indexes; one shares its name with a composite index."""
+    existing = {
+        (ix["name"], tuple(ix["column_names"]))
+        for table in ("chat_history", "materials") for ix in inspect(conn).get_indexes(table)
+    }
+    for name, columns in (("ix_chat_history_cache_key", ("cache_key",)), ("ix_materials_sha256", ("sha256",))):
+        if (name, columns) in existing:
+            conn.execute(text(f"DROP INDEX {name}"))
+
+
+def rebuild_changed_tables(conn):
+    """Recreate tables whose primary or foreign keys changed, copying their rows.
+
+    SQLite can't alter keys in place, so this is its usual rebuild: create
+    the new table under a temporary name, copy, drop the old one, rename.
+    migrate() runs it with foreign keys off and checks them afterwards.
+    """
+    if conn.dialect.name != "sqlite":
+        raise RuntimeError("Change the primary keys with the DDL in SUPABASE.md, then rerun the migrations")
+    inspector = inspect(conn)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        pk = inspector.get_pk_constraint(table.name)["constrained_columns"]
+        fks = sorted(
+            (tuple(fk["constrained_columns"]), fk["referred_table"], tuple(fk["referred_columns"]))
+            for fk in inspector.get_foreign_keys(table.name)
+        )
+        wanted_fks = sorted(
+            (tuple(fk.column_keys), fk.referred_table.name, tuple(e.column.name for e in fk.elements))
+            for fk in table.foreign_key_constraints
+        )
+        if pk == [c.name for c in table.primary_key.columns] and fks == wanted_fks:
+            continue
+        columns = ", ".join(f'"{c["name"]}"' for c in inspector.get_columns(table.name) if c["name"] in table.columns)
+        ddl = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+        conn.execute(text(ddl.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE _new_{table.name} ", 1)))
+        conn.execute(text(f"INSERT INTO _new_{table.name} ({columns}) SELECT {columns} FROM {table.name}"))
+        conn.execute(text(f"DROP TABLE {table.name}"))
+        conn.execute(text(f"ALTER TABLE _new_{table.name} RENAME TO {table.name}"))
+        for index in table.indexes:
+            index.create(conn)
+
+
+def drop_stale_indexes(conn):
+    """Drop ix_* indexes the models no longer declare (superseded by tenant-leading ones)."""
+    inspector = inspect(conn)
+    for table in db.metadata.sorted_tables:
+        wanted = {index.name for index in table.indexes}
+        for index in inspector.get_indexes(table.name):
+            if index["name"].startswith("ix_") and index["name"] not in wanted:
+                conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+
+
+def create_indexes(conn):
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def add_tenancy(conn):
+    add_missing_columns(conn)
+    rebuild_changed_tables(conn)
+
+
+def replace_indexes(conn):
+    drop_stale_indexes(conn)
+    create_indexes(conn)
+
+
+def seed_xp_ledger(conn):
+    """Carry each student's legacy user_stats.xp into xp_ledger as an opening balance, like SUPABASE.md."""
+    conn.execute(
+        text(
+            "INSERT INTO xp_ledger (user_id, delta, reason, created_at) "
+            "SELECT COALESCE(s.user_id, :default_user), s.xp, 'opening_balance', :now FROM user_stats s "
+            "WHERE s.xp <> 0 AND NOT EXISTS "
+            "(SELECT 1 FROM xp_ledger l WHERE l.user_id = COALESCE(s.user_id, :default_user))"
+        ),
+        {"default_user": DEFAULT_USER, "now": datetime.now().isoformat(timespec="seconds")},
+    )
+
+
+def analyze(conn):
+    # Planner statistics, so SQLite picks between the overlapping indexes by selectivity
+    conn.execute(text("ANALYZE"))
+
+
+MIGRATIONS = [
+    (1, "add columns added since the first schema", add_missing_columns),
+    (2, "replace single-column indexes with composite ones", drop_legacy_indexes),
+    (3, "composite indexes for the access patterns", create_indexes),
+    (4, "planner statistics", analyze),
+    (5, "user_id on every table, leading the primary keys", add_tenancy),
+    (6, "tenant-leading indexes", replace_indexes),
+    (7, "planner statistics", analyze),
+    (8, "xp_ledger opening balances from user_stats", seed_xp_ledger),
+    (9, "xp_ledger (user_id, created_at) index for the lookback window", create_indexes),
+]
+
+
+def migrate(engine) -> list[int]:
+    """Apply pending MIGRATIONS; returns the versions applied."""
+    sqlite = engine.dialect.name == "sqlite"
+    applied = []
+    with engine.connect() as conn:
+        # SQLite's procedure for schema changes: FKs off (only possible outside
+        # a transaction), change, then foreign_key_check before committing
+        if sqlite:
+            conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+            conn.commit()
+        try:
+            with conn.begin():
+                conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS schema_migrations "
+                    "(version INTEGER PRIMARY KEY, description TEXT, applied_at TEXT)"
+                ))
+                done = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+            for version, description, step in MIGRATIONS:
+                if version in done:
+                    continue
+                with conn.begin():
+                    step(conn)
+                    if sqlite and conn.exec_driver_sql("PRAGMA foreign_key_check").first():
+                        raise RuntimeError(f"Migration {version} left rows with dangling foreign keys")
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                        {"v": version, "d": description, "t": datetime.now().isoformat(timespec="seconds")},
+                    )
+                applied.append(version)
+        finally:
+            if sqlite:
+                conn.rollback()
+                conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+                conn.commit()
+    return applied
+
+
 def seed_from_initial_data(app):
     """Populate the database with initial course data if tables are empty."""
     from course_data import INITIAL_COURSES, INITIAL_DEADLINES
@@ -232,6 +550,8 @@ def migrate_from_json(app, json_path: Path):
             db.session.add(ChatHistory(**ch))
 
         db.session.add(UserStats(id=1, xp=data.get("xp", 0)))
+        if data.get("xp"):
+            db.session.add(XpLedger(delta=data["xp"], reason="opening_balance"))
         db.session.commit()
 
         backup = json_path.with_suffix(".json.bak")
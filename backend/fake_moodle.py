@@ -0,0 +1,220 @@
+"""
+Local stand-in for HKBU Moodle, for exercising moodle_download.py offline.
+
+Usage:
+    python fake_moodle.py [--port 8765] [--courses 3] [--files 20] ...
+    MOODLE_URL=http://127.0.0.1:8765 python moodle_download.py
+
+Serves the pages the downloader touches:
+  /my/                                  dashboard with course links
+  /course/view.php?id=N                 course page with resource, folder and direct links
+  /mod/resource/view.php?id=N           302 redirect to the pluginfile URL
+  /mod/folder/view.php?id=N             folder listing of pluginfile links
+  /pluginfile.php/...                   file bodies with content-disposition headers
+
+Some files are large and some respond slowly, so throughput changes in the
+download pipeline show up in bench_moodle_download.py.
+"""
+
+import argparse
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+CHUNK = 64 * 1024
+
+
+@dataclass
+class FakeFile:
+    id: int
+    name: str
+    size: int
+    delay: float = 0.0
+    # "attachment" sends filename=, "utf8" sends filename*=UTF-8'', "none" relies on the URL path
+    disposition: str = "attachment"
+
+    @property
+    def url_path(self) -> str:
+        return f"/pluginfile.php/{self.id}/mod_resource/content/0/{quote(self.name)}"
+
+
+@dataclass
+class FakeCourse:
+    id: int
+    name: str
+    resources: list[FakeFile] = field(default_factory=list)
+    folders: dict[int, list[FakeFile]] = field(default_factory=dict)
+    direct: list[FakeFile] = field(default_factory=list)
+
+    @property
+    def file_count(self) -> int:
+        return len(self.resources) + len(self.direct) + sum(len(f) for f in self.folders.values())
+
+
+COURSE_NAMES = [
+    "COMP7045 NLP & Large Language Model",
+    "COMP7055 Computer Vision and Pattern Recognition",
+    "COMP7930 IT Forum",
+]
+
+
+def build_site(courses=3, files=20, folders=2, folder_files=5, size_kb=256,
+               large_every=10, large_mb=20, slow_every=7, slow_ms=300) -> dict[int, FakeCourse]:
+    """Generate a deterministic set of courses and files."""
+    site = {}
+    next_id = 1000
+    for c in range(courses):
+        course_id = 100 + c
+        name = COURSE_NAMES[c] if c < len(COURSE_NAMES) else f"COMP{8000 + c} Course {c + 1}"
+        course = FakeCourse(id=course_id, name=name)
+
+        def make(kind: str, n: int, ext: str = ".pdf", bare_ok: bool = True) -> FakeFile:
+            nonlocal next_id
+            next_id += 1
+            size = large_mb * 1024 * 1024 if large_every and n % large_every == large_every - 1 else size_kb * 1024
+            delay = slow_ms / 1000 if slow_every and n % slow_every == slow_every - 1 else 0.0
+            # Redirected resources always name themselves; real pluginfile.php does too
+            disposition = ("attachment", "utf8", "none")[n % 3 if bare_ok else n % 2]
+            return FakeFile(next_id, f"{kind} {c + 1}-{n + 1}{ext}", size, delay, disposition)
+
+        for n in range(files):
+            course.resources.append(make("Lecture", n, bare_ok=False))
+        for f in range(folders):
+            next_id += 1
+            folder_id = next_id
+            course.folders[folder_id] = [make(f"Lab{f + 1}", n, ".zip") for n in range(folder_files)]
+        course.direct.append(make("Syllabus", 0, ".docx"))
+        site[course_id] = course
+    return site
+
+
+def make_handler(site: dict[int, FakeCourse]):
+    files = {}
+    resources = {}
+    for course in site.values():
+        for f in course.resources:
+            resources[f.id] = f
+        for f in [*course.resources, *course.direct, *(x for fs in course.folders.values() for x in fs)]:
+            files[f.id] = f
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_html(self, body: str, status: int = 200):
+            data = f"<!doctype html><html><body>{body}</body></html>".encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            path = parsed.path
+            qid = parse_qs(parsed.query).get("id", ["0"])[0]
+            qid = int(qid) if qid.isdigit() else 0
+
+            if path in ("/my/", "/my", "/login/index.php", "/"):
+                links = "".join(f'<li><a href="/course/view.php?id={c.id}">{c.name}</a></li>' for c in site.values())
+                return self.send_html(f"<ul>{links}</ul>")
+
+            if path == "/course/view.php" and qid in site:
+                c = site[qid]
+                parts = [f'<a href="/mod/resource/view.php?id={f.id}">{f.name}</a>' for f in c.resources]
+                parts += [f'<a href="/mod/folder/view.php?id={fid}">Folder {fid}</a>' for fid in c.folders]
+                parts += [f'<a href="/files/{f.id}/{quote(f.name)}">{f.name}</a>' for f in c.direct]
+                parts += ['<a href="/user/profile.php">Profile</a>', '<a href="#top">Top</a>']
+                return self.send_html("<br>".join(parts))
+
+            if path == "/mod/resource/view.php" and qid in resources:
+                self.send_response(302)
+                self.send_header("Location", resources[qid].url_path)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            if path == "/mod/folder/view.php":
+                for c in site.values():
+                    if qid in c.folders:
+                        links = "".join(f'<li><a href="{f.url_path}">{f.name}</a></li>' for f in c.folders[qid])
+                        return self.send_html(f"<ul>{links}</ul>")
+
+            if path.startswith("/pluginfile.php/") or path.startswith("/files/"):
+                segments = path.split("/")
+                fid = int(segments[2]) if len(segments) > 2 and segments[2].isdigit() else 0
+                if fid in files:
+                    return self.send_file(files[fid])
+
+            self.send_html("<p>Not found</p>", status=404)
+
+        def send_file(self, f: FakeFile):
+            if f.delay:
+                time.sleep(f.delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(f.size))
+            if f.disposition == "attachment":
+                self.send_header("Content-Disposition", f'attachment; filename="{f.name}"')
+            elif f.disposition == "utf8":
+                self.send_header("Content-Disposition", f"inline; filename*=UTF-8''{quote(f.name)}")
+            self.end_headers()
+            stamp = f"%PDF-fake {f.id} ".encode()
+            block = (stamp * (CHUNK // len(stamp) + 1))[:CHUNK]
+            remaining = f.size
+            while remaining > 0:
+                n = min(CHUNK, remaining)
+                self.wfile.write(block[:n])
+                remaining -= n
+
+    return Handler
+
+
+def serve(site: dict[int, FakeCourse], host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the fake site in a background thread. Port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), make_handler(site))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_site_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--courses", type=int, default=3)
+    parser.add_argument("--files", type=int, default=20, help="resource files per course")
+    parser.add_argument("--folders", type=int, default=2, help="folders per course")
+    parser.add_argument("--folder-files", type=int, default=5)
+    parser.add_argument("--size-kb", type=int, default=256)
+    parser.add_argument("--large-every", type=int, default=10, help="every Nth file is large (0 = never)")
+    parser.add_argument("--large-mb", type=int, default=20)
+    parser.add_argument("--slow-every", type=int, default=7, help="every Nth file is slow (0 = never)")
+    parser.add_argument("--slow-ms", type=int, default=300)
+
+
+def site_from_args(args) -> dict[int, FakeCourse]:
+    return build_site(args.courses, args.files, args.folders, args.folder_files, args.size_kb,
+                      args.large_every, args.large_mb, args.slow_every, args.slow_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_site_arguments(parser)
+    args = parser.parse_args()
+
+    site = site_from_args(args)
+    server = serve(site, args.host, args.port)
+    total = sum(c.file_count for c in site.values())
+    print(f"Fake Moodle at http://{args.host}:{server.server_port} ({len(site)} courses, {total} files)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""In-process background job queue with job state persisted in SQLite.
+
+Handlers run on a small thread pool so request workers never wait on them.
+Each job type has its own concurrency limit; jobs over the limit stay queued
+until a slot of that type frees up. Cancellation is cooperative: a handler
+calls `job.progress(...)` or `job.check()` and gets JobCancelled once a
+cancel has been requested.
+
+Several processes (gunicorn workers) can share one jobs database. A job
+runs in the process whose atomic queued -> running update succeeds, and
+the row records that process as its owner. On startup a process only
+fails running jobs whose owner process has exited. Cancelling a job
+running in another process sets cancel_requested on its row, which the
+owner's job.check() picks up within CANCEL_POLL_SECONDS. Concurrency
+limits are per process.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from tenants import DEFAULT_USER
+
+JOBS_PATH = Path(__file__).resolve().parent / "data" / "jobs.sqlite"
+MAX_WORKERS = 4
+CANCEL_POLL_SECONDS = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL DEFAULT 'default',
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT,
+    progress REAL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, created_at);
+"""
+# Run after SCHEMA, once the user_id column exists on older databases too
+INDEXES = "CREATE INDEX IF NOT EXISTS jobs_user_idx ON jobs (user_id, created_at);"
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def owner_alive(owner: str | None) -> bool:
+    """owner is "<pid>:<token>" of a process on this host (the jobs database is a local file)."""
+    try:
+        os.kill(int(owner.split(":")[0]), 0)
+    except (AttributeError, ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+
+class Job:
+    """Handle passed to a job handler."""
+
+    def __init__(self, queue: "JobQueue", job_id: str, params: dict, user_id: str = DEFAULT_USER):
+        self.queue = queue
+        self.id = job_id
+        self.params = params
+        self.user_id = user_id
+        self.cancel_requested = threading.Event()
+        self.polled_at = time.monotonic()
+
+    def check(self):
+        # Cancels from other processes arrive through the jobs table
+        if not self.cancel_requested.is_set() and time.monotonic() - self.polled_at >= CANCEL_POLL_SECONDS:
+            self.polled_at = time.monotonic()
+            if self.queue._cancel_requested(self.id):
+                self.cancel_requested.set()
+        if self.cancel_requested.is_set():
+            raise JobCancelled()
+
+    def progress(self, fraction: float, message: str | None = None):
+        self.check()
+        self.queue._update(self.id, progress=round(max(0.0, min(1.0, fraction)), 4), message=message)
+
+
+class JobQueue:
+    def __init__(self, path: Path = JOBS_PATH, workers: int = MAX_WORKERS):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if "user_id" not in columns:
+            self.conn.execute(f"ALTER TABLE jobs ADD COLUMN user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER}'")
+        if "owner" not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        if "cancel_requested" not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+        self.conn.executescript(INDEXES)
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.handlers: dict[str, callable] = {}
+        self.limits: dict[str, int] = {}
+        self.running: dict[str, int] = {}
+        self.waiting: dict[str, deque] = {}
+        self.active: dict[str, Job] = {}
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Jobs whose process stopped while running them cannot be resumed; other live workers' jobs are left alone
+        with self.conn:
+            owners = [row["owner"] for row in self.conn.execute("SELECT DISTINCT owner FROM jobs WHERE status = 'running'")]
+            for owner in owners:
+                if not owner_alive(owner):
+                    self.conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = 'interrupted by restart', finished_at = ? "
+                        "WHERE status = 'running' AND owner IS ?", (now(), owner),
+                    )
+
+    def register(self, job_type: str, handler, limit: int = 1):
+        """handler(job) -> JSON-serialisable result; at most `limit` of this type run at once."""
+        self.handlers[job_type] = handler
+        self.limits[job_type] = limit
+        self.running.setdefault(job_type, 0)
+        self.waiting.setdefault(job_type, deque())
+        # Pick up jobs of this type still queued from a previous run; _run's claim stops them running twice
+        for row in self.conn.execute(
+            "SELECT id, user_id, params FROM jobs WHERE type = ? AND status = 'queued' ORDER BY created_at",
+            (job_type,),
+        ).fetchall():
+            self._enqueue(job_type, row["id"], json.loads(row["params"] or "{}"), row["user_id"])
+
+    def submit(self, job_type: str, params: dict | None = None, user_id: str = DEFAULT_USER) -> dict:
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        job_id = str(uuid.uuid4())
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (id, user_id, type, status, params, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, user_id, job_type, json.dumps(params or {}), now()),
+            )
+        self._enqueue(job_type, job_id, params or {}, user_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict | None:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def recent(self, status: str | None = None, limit: int = 50, user_id: str | None = None) -> list[dict]:
+        where, params = [], []
+        if user_id:
+            where.append("user_id = ?")
+            params.append(user_id)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        sql = "SELECT * FROM jobs" + (f" WHERE {' AND '.join(where)}" if where else "")
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    def cancel(self, job_id: str) -> dict | None:
+        with self.lock:
+            job = self.active.get(job_id)
+            if job:
+                job.cancel_requested.set()
+            else:
+                with self.conn:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                        (now(), job_id),
+                    )
+                    # Running in another process: its job.check() sees the flag
+                    self.conn.execute(
+                        "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,),
+                    )
+                for q in self.waiting.values():
+                    for item in list(q):
+                        if item[0] == job_id:
+                            q.remove(item)
+        return self.get(job_id)
+
+    # ─── Internals ───
+
+    def _enqueue(self, job_type: str, job_id: str, params: dict, user_id: str):
+        with self.lock:
+            self.waiting[job_type].append((job_id, params, user_id))
+            self._dispatch(job_type)
+
+    def _dispatch(self, job_type: str):
+        """Start queued jobs of this type while under its limit. Caller holds self.lock."""
+        q = self.waiting[job_type]
+        while q and self.running[job_type] < self.limits[job_type]:
+            job_id, params, user_id = q.popleft()
+            job = Job(self, job_id, params, user_id)
+            self.active[job_id] = job
+            self.running[job_type] += 1
+            self.pool.submit(self._run, job_type, job)
+
+    def _claim(self, job_id: str) -> bool:
+        """Atomically mark a queued job as running here; False if cancelled or another process took it."""
+        with self.lock, self.conn:
+            return self.conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, started_at = ? WHERE id = ? AND status = 'queued'",
+                (self.owner, now(), job_id),
+            ).rowcount == 1
+
+    def _run(self, job_type: str, job: Job):
+        try:
+            if not self._claim(job.id):
+                return
+            job.check()
+            result = self.handlers[job_type](job)
+            self._update(job.id, status="succeeded", progress=1.0, result=json.dumps(result), finished_at=now())
+        except JobCancelled:
+            self._update(job.id, status="cancelled", finished_at=now())
+        except (Exception, SystemExit) as e:
+            self._update(job.id, status="failed", error=f"{type(e).__name__}: {e}",
+                         message=traceback.format_exc(limit=3), finished_at=now())
+        finally:
+            with self.lock:
+                self.active.pop(job.id, None)
+                self.running[job_type] -= 1
+                self._dispatch(job_type)
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def _update(self, job_id: str, **fields):
+        fields = {k: v for k, v in fields.items() if v is not None}
+        if not fields:
+            return
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        d = dict(row)
+        d["params"] = json.loads(d["params"] or "{}")
+        d["result"] = json.loads(d["result"]) if d["result"] else None
+        return d
@@ -0,0 +1,180 @@
+"""GenAI chat client and a response cache backed by chat_history.
+
+Replies are cached under a key made from the normalised prompt, the course
+and a fingerprint of the context sent with it. Recent keys live in an
+in-process LRU with a TTL; older ones are found again through the
+`cache_key` column on chat_history, so a restart doesn't lose the cache.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from tenants import DEFAULT_USER
+
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+CACHE_MAX_ENTRIES = 512
+
+
+class HKBUClient:
+    """HKBU GenAI (Azure OpenAI style) chat completions."""
+
+    def __init__(self, api_key=None, base_url=None, model=None, api_version=None, timeout=60):
+        self.api_key = api_key or os.environ.get("HKBU_API_KEY", "")
+        self.base_url = (base_url or os.environ.get("HKBU_BASE_URL", "https://genai.hkbu.edu.hk/api/v0/rest")).rstrip("/")
+        self.model = model or os.environ.get("HKBU_MODEL", "gpt-4.1")
+        self.api_version = api_version or os.environ.get("HKBU_API_VERSION", "2024-12-01-preview")
+        self.timeout = timeout
+
+    def complete(self, messages: list[dict]) -> str:
+        url = f"{self.base_url}/deployments/{self.model}/chat/completions?api-version={self.api_version}"
+        req = urllib.request.Request(
+            url,
+            data=json.dumps({"messages": messages}).encode(),
+            headers={"Content-Type": "application/json", "api-key": self.api_key},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            data = json.load(resp)
+        return data["choices"][0]["message"]["content"]
+
+
+class StubClient:
+    """Deterministic offline stand-in; set LLM_CLIENT=stub or pass one to the app in tests."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, messages: list[dict]) -> str:
+        self.calls += 1
+        return f"[stub reply] {messages[-1]['content'][:200]}"
+
+
+def make_client():
+    return StubClient() if os.environ.get("LLM_CLIENT") == "stub" else HKBUClient()
+
+
+def normalize_prompt(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!. ").lower()
+
+
+def cache_key(prompt: str, course_id: str | None, context_fingerprint: str = "") -> str:
+    raw = "\x1f".join([normalize_prompt(prompt), course_id or "", context_fingerprint])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def context_fingerprint(chunks: list[dict]) -> str:
+    h = hashlib.sha1()
+    for c in chunks:
+        h.update(c["text"].encode())
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+class ChatHistoryStore:
+    """Reads and writes one student's cached replies through the chat_history table."""
+
+    def __init__(self, supabase, user_id: str = DEFAULT_USER):
+        self.supabase = supabase
+        self.user_id = user_id
+
+    def lookup(self, key: str, since: datetime) -> str | None:
+        rows = (
+            self.supabase.table("chat_history").select("ai_reply")
+            .eq("user_id", self.user_id).eq("cache_key", key).gte("timestamp", since.isoformat(timespec="seconds"))
+            .order("timestamp", desc=True).limit(1).execute().data
+        )
+        return rows[0]["ai_reply"] if rows else None
+
+    def save(self, course_id: str | None, user_message: str, ai_reply: str, key: str) -> dict:
+        row = {
+            "id": str(uuid.uuid4()),
+            "user_id": self.user_id,
+            "course_id": course_id,
+            "user_message": user_message,
+            "ai_reply": ai_reply,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "cache_key": key,
+        }
+        self.supabase.table("chat_history").insert(row).execute()
+        return row
+
+
+class ResponseCache:
+    """LRU of recent replies with TTL expiry, falling back to a persistent store."""
+
+    def __init__(self, store: ChatHistoryStore | None = None,
+                 ttl: int = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES):
+        self.store = store
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.store_hits = self.misses = self.evictions = 0
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self.entries[key]
+                self.evictions += 1
+        reply = self.store.lookup(key, datetime.now() - timedelta(seconds=self.ttl)) if self.store else None
+        with self.lock:
+            if reply is None:
+                self.misses += 1
+                return None
+            self.store_hits += 1
+            self._put(key, reply, now)
+        return reply
+
+    def put(self, key: str, reply: str):
+        with self.lock:
+            self._put(key, reply, time.time())
+
+    def _put(self, key: str, reply: str, stored_at: float):
+        self.entries[key] = (reply, stored_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.store_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.store_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+SYSTEM_PROMPT = (
+    "You are StudyDash's study assistant for a university student. Answer clearly and concisely, "
+    "using the provided course material when it is relevant."
+)
+
+
+def build_messages(question: str, chunks: list[dict]) -> list[dict]:
+    context = "\n\n---\n\n".join(f"[{c['source']}]\n{c['text']}" for c in chunks)
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if context:
+        messages.append({"role": "system", "content": f"Course material:\n\n{context}"})
+    messages.append({"role": "user", "content": question})
+    return messages
@@ -10,35 +10,39 @@ Usage:
 4. Script auto-discovers courses and downloads all materials
 """
 
+import json
 import os
 import re
 import sys
 import time
 import logging
+from collections import Counter
+from datetime import datetime
+from logging.handlers import MemoryHandler
 from pathlib import Path
 from urllib.parse import urlparse, unquote
 
 from playwright.sync_api import sync_playwright, Page, BrowserContext
 
-MOODLE_URL = "https://buelearning.hkbu.edu.hk"
+MOODLE_URL = os.environ.get("MOODLE_URL", "https://buelearning.hkbu.edu.hk")
 MATERIALS_DIR = Path(__file__).parent / "materials"
 DATA_DIR = Path(__file__).parent / "data"
 LOG_FILE = DATA_DIR / "moodle_download.log"
+EVENTS_FILE = DATA_DIR / "moodle_events.jsonl"
+SUMMARY_FILE = DATA_DIR / "moodle_summary.json"
 TRIGGER_FILE = DATA_DIR / "login_ready"
 
 DATA_DIR.mkdir(exist_ok=True)
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s  %(message)s",
-    datefmt="%H:%M:%S",
-    handlers=[
-        logging.FileHandler(str(LOG_FILE), mode="w"),
-        logging.StreamHandler(sys.stdout),
-    ],
-    force=True,
-)
+LOG_BUFFER = 200
 log = logging.getLogger("moodle")
+log.setLevel(logging.DEBUG)
+log_buffer: MemoryHandler | None = None
+
+REQUEST_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 1.0
+EVENT_BUFFER = 64 * 1024
+SLOWEST_FILES = 10
 
 COURSE_FOLDER_MAP = {
     "comp7045": "nlp",
@@ -59,11 +63,85 @@ DOWNLOADABLE_EXTENSIONS = {
 }
 
 
-def flush():
-    sys.stdout.flush()
-    sys.stderr.flush()
-    for h in log.handlers:
-        h.flush()
+def setup_logging():
+    """Root logging for a script run; importing the module leaves the importer's logging alone.
+
+    Per-file lines are DEBUG: they go to the log file through a buffer
+    (written every LOG_BUFFER records, on a warning, and at the end of the
+    run) while the console only shows course-level progress.
+    """
+    global log_buffer
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(logging.INFO)
+    log_buffer = MemoryHandler(LOG_BUFFER, flushLevel=logging.WARNING,
+                               target=logging.FileHandler(str(LOG_FILE), mode="w"))
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s  %(message)s",
+        datefmt="%H:%M:%S",
+        handlers=[log_buffer, console],
+        force=True,
+    )
+    log_buffer.target.setFormatter(console.formatter)
+
+
+def flush_log():
+    if log_buffer is not None:
+        log_buffer.flush()
+
+
+class RunStats:
+    """Structured per-file events and the run summary.
+
+    Each download attempt becomes one JSON line in events_path (written
+    through a 64 KB buffer, not per line); summary() totals them.
+    """
+
+    def __init__(self, events_path: Path | None = EVENTS_FILE):
+        self.started = time.perf_counter()
+        self.events: list[dict] = []
+        self.events_file = open(events_path, "w", buffering=EVENT_BUFFER) if events_path else None
+
+    def record(self, course: dict, url: str, result: dict, seconds: float):
+        event = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"), "course": course["folder"], "url": url,
+            "file": result.get("file"), "outcome": result["outcome"], "bytes": result.get("bytes", 0),
+            "seconds": round(seconds, 3), "retries": result.get("retries", 0), "method": result.get("method"),
+        }
+        if result.get("error"):
+            event["error"] = result["error"]
+        self.events.append(event)
+        if self.events_file:
+            self.events_file.write(json.dumps(event) + "\n")
+        log.debug(f"    {event['outcome']}: {event['file'] or url} ({event['bytes'] // 1024}KB, {event['seconds']}s)")
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        downloaded = [e for e in self.events if e["outcome"] == "downloaded"]
+        total_bytes = sum(e["bytes"] for e in downloaded)
+        transfer_seconds = sum(e["seconds"] for e in downloaded)
+        return {
+            "files": len(self.events),
+            "outcomes": dict(Counter(e["outcome"] for e in self.events)),
+            "bytes": total_bytes,
+            "seconds": round(elapsed, 3),
+            "mb_per_s": round(total_bytes / (1024 * 1024) / elapsed, 3) if elapsed else 0.0,
+            # Throughput while actually transferring, excluding page scans and logins
+            "transfer_mb_per_s": round(total_bytes / (1024 * 1024) / transfer_seconds, 3) if transfer_seconds else 0.0,
+            "retries": sum(e["retries"] for e in self.events),
+            "slowest": [
+                {k: e[k] for k in ("url", "file", "outcome", "bytes", "seconds", "retries")}
+                for e in sorted(self.events, key=lambda e: e["seconds"], reverse=True)[:SLOWEST_FILES]
+            ],
+        }
+
+    def close(self, summary_path: Path | None = SUMMARY_FILE) -> dict:
+        summary = self.summary()
+        if self.events_file:
+            self.events_file.close()
+        if summary_path:
+            summary_path.write_text(json.dumps(summary, indent=2))
+        return summary
 
 
 def match_course_folder(course_name: str) -> str:
@@ -80,7 +158,6 @@ def wait_for_login(timeout_seconds=300):
         TRIGGER_FILE.unlink()
     log.info("Waiting for login signal...")
     log.info(f"  Trigger file: {TRIGGER_FILE}")
-    flush()
     start = time.time()
     while time.time() - start < timeout_seconds:
         if TRIGGER_FILE.exists():
@@ -90,14 +167,24 @@ def wait_for_login(timeout_seconds=300):
     return False
 
 
+# One round trip per page: resolve every matching anchor's href and text in-page.
+LINKS_JS = "els => els.map(a => [a.href, (a.innerText || '').trim()])"
+
+RESOURCE_PATTERNS = ("/mod/resource/", "/mod/folder/", "/pluginfile.php/")
+FOLDER_TABS = 4
+
+
+def collect_links(page: Page, selector: str = "a[href]") -> list[tuple[str, str]]:
+    """Return (href, text) for every element matching selector in a single evaluation."""
+    return [(href, text) for href, text in page.eval_on_selector_all(selector, LINKS_JS) if href]
+
+
 def discover_courses(page: Page) -> list[dict]:
     page.goto(f"{MOODLE_URL}/my/", wait_until="networkidle", timeout=30000)
     courses = []
     seen_ids = set()
 
-    for link in page.query_selector_all('a[href*="course/view.php"]'):
-        href = link.get_attribute("href") or ""
-        text = (link.inner_text() or "").strip()
+    for href, text in collect_links(page, 'a[href*="course/view.php"]'):
         if not text or "course/view.php" not in href:
             continue
         match = re.search(r"id=(\d+)", href)
@@ -117,8 +204,44 @@ def discover_courses(page: Page) -> list[dict]:
     return courses
 
 
-def try_download_via_expect(page: Page, url: str, folder: Path) -> str | None:
-    """Try Playwright expect_download approach."""
+def discover_folder_files(context: BrowserContext, folder_urls: list[str], tabs: int = FOLDER_TABS) -> dict[str, list[str]]:
+    """Load folder pages across several tabs at once and collect their pluginfile links.
+
+    Navigations in a batch are started together and only then awaited, so the
+    browser fetches up to `tabs` folder pages concurrently.
+    """
+    files: dict[str, list[str]] = {}
+    if not folder_urls:
+        return files
+
+    pages = [context.new_page() for _ in range(min(tabs, len(folder_urls)))]
+    try:
+        for start in range(0, len(folder_urls), len(pages)):
+            batch = list(zip(pages, folder_urls[start:start + len(pages)]))
+            for tab, url in batch:
+                try:
+                    tab.goto(url, wait_until="commit", timeout=15000)
+                except Exception as e:
+                    log.info(f"    Folder failed: {url} ({e})")
+                    files[url] = []
+            for tab, url in batch:
+                if url in files:
+                    continue
+                try:
+                    tab.wait_for_load_state("networkidle", timeout=15000)
+                    hrefs = [href for href, _ in collect_links(tab, 'a[href*="pluginfile.php"]')]
+                    files[url] = list(dict.fromkeys(hrefs))
+                except Exception as e:
+                    log.info(f"    Folder failed: {url} ({e})")
+                    files[url] = []
+    finally:
+        for tab in pages:
+            tab.close()
+    return files
+
+
+def try_download_via_expect(page: Page, url: str, folder: Path) -> dict | None:
+    """Try Playwright expect_download approach. Returns a file result, or None if nothing downloaded."""
     try:
         with page.expect_download(timeout=10000) as dl_info:
             page.goto(url, timeout=10000)
@@ -127,22 +250,37 @@ def try_download_via_expect(page: Page, url: str, folder: Path) -> str | None:
         if filename:
             target = folder / filename
             if target.exists():
-                log.info(f"    Skip (exists): {filename}")
-                flush()
-                return filename
+                return {"file": filename, "outcome": "exists", "method": "expect"}
             download.save_as(str(target))
-            log.info(f"    Downloaded: {filename}")
-            flush()
-            return filename
+            return {"file": filename, "outcome": "downloaded", "bytes": target.stat().st_size, "method": "expect"}
     except Exception:
         pass
     return None
 
 
-def try_download_via_request(context: BrowserContext, url: str, folder: Path) -> str | None:
-    """Use Playwright API request to directly fetch the file."""
+def try_download_via_request(context: BrowserContext, url: str, folder: Path) -> dict | None:
+    """Use Playwright API request to directly fetch the file.
+
+    Network errors and 5xx responses are retried REQUEST_RETRIES times with
+    backoff; a 5xx that outlasts them is a failed result. Returns a file
+    result, or None if the URL isn't a file.
+    """
+    for attempt in range(REQUEST_RETRIES + 1):
+        try:
+            response = context.request.get(url, timeout=30000)
+            if response.status >= 500 and attempt < REQUEST_RETRIES:
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+                continue
+            break
+        except Exception as e:
+            if attempt == REQUEST_RETRIES:
+                return {"outcome": "failed", "error": str(e), "retries": attempt, "method": "request"}
+            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+    retries = attempt
+    if response.status >= 500:
+        return {"outcome": "failed", "error": f"HTTP {response.status}", "retries": retries, "method": "request"}
+
     try:
-        response = context.request.get(url, timeout=30000)
         if response.status != 200:
             return None
 
@@ -167,98 +305,90 @@ def try_download_via_request(context: BrowserContext, url: str, folder: Path) ->
 
         target = folder / filename
         if target.exists():
-            log.info(f"    Skip (exists): {filename}")
-            flush()
-            return filename
-
-        target.write_bytes(response.body())
-        log.info(f"    Downloaded: {filename} ({len(response.body()) // 1024}KB)")
-        flush()
-        return filename
+            return {"file": filename, "outcome": "exists", "retries": retries, "method": "request"}
+
+        body = response.body()
+        target.write_bytes(body)
+        return {"file": filename, "outcome": "downloaded", "bytes": len(body), "retries": retries, "method": "request"}
     except Exception as e:
-        log.info(f"    Request failed: {e}")
-        flush()
-        return None
+        return {"outcome": "failed", "error": str(e), "retries": retries, "method": "request"}
 
 
-def download_course_materials(page: Page, context: BrowserContext, course: dict, download_dir: Path) -> int:
+def download_course_materials(page: Page, context: BrowserContext, course: dict, download_dir: Path,
+                              stats: RunStats | None = None) -> int:
+    """Download one course's files; returns how many are now present. Per-file events go to stats."""
+    stats = stats or RunStats(events_path=None)
     folder = download_dir / course["folder"]
     folder.mkdir(parents=True, exist_ok=True)
 
     log.info(f"Scanning: {course['name']}")
-    flush()
     page.goto(course["url"], wait_until="networkidle", timeout=30000)
 
     resource_urls = []
     seen_urls = set()
 
-    for link in page.query_selector_all('a[href*="/mod/resource/"], a[href*="/mod/folder/"], a[href*="/pluginfile.php/"]'):
-        href = link.get_attribute("href") or ""
-        if href and href not in seen_urls:
-            seen_urls.add(href)
-            text = (link.inner_text() or "").strip()
-            resource_urls.append({"url": href, "title": text, "type": "moodle"})
-
-    for link in page.query_selector_all("a[href]"):
-        href = link.get_attribute("href") or ""
+    for href, text in collect_links(page):
         if href in seen_urls:
             continue
-        parsed = urlparse(href)
-        if any(parsed.path.lower().endswith(ext) for ext in DOWNLOADABLE_EXTENSIONS):
-            seen_urls.add(href)
-            text = (link.inner_text() or "").strip()
-            resource_urls.append({"url": href, "title": text, "type": "direct"})
+        if any(p in href for p in RESOURCE_PATTERNS):
+            kind = "moodle"
+        elif any(urlparse(href).path.lower().endswith(ext) for ext in DOWNLOADABLE_EXTENSIONS):
+            kind = "direct"
+        else:
+            continue
+        seen_urls.add(href)
+        resource_urls.append({"url": href, "title": text, "type": kind})
 
     if not resource_urls:
         log.info("  No downloadable resources found.")
-        flush()
         return 0
 
     log.info(f"  Found {len(resource_urls)} resource links")
-    flush()
+
+    folder_files = discover_folder_files(context, [r["url"] for r in resource_urls if "/mod/folder/" in r["url"]])
 
     downloaded = 0
     for i, res in enumerate(resource_urls, 1):
         url = res["url"]
         title = res["title"] or url.split("/")[-1]
-        log.info(f"  [{i}/{len(resource_urls)}] {title[:60]}")
-        flush()
+        log.debug(f"  [{i}/{len(resource_urls)}] {title[:60]}")
+
+        # Folder links: inner files were collected up front in parallel tabs
+        if "/mod/folder/" in url:
+            for file_href in folder_files.get(url, []):
+                start = time.perf_counter()
+                result = try_download_via_request(context, file_href, folder) or {"outcome": "not_downloadable"}
+                stats.record(course, file_href, result, time.perf_counter() - start)
+                if result.get("file"):
+                    downloaded += 1
+            continue
 
+        start = time.perf_counter()
         try:
-            # Handle folder links: navigate and collect inner files
-            if "/mod/folder/" in url:
-                page.goto(url, wait_until="networkidle", timeout=15000)
-                for file_link in page.query_selector_all('a[href*="pluginfile.php"]'):
-                    file_href = file_link.get_attribute("href") or ""
-                    if file_href:
-                        result = try_download_via_request(context, file_href, folder)
-                        if result:
-                            downloaded += 1
-                continue
-
             # For resource/pluginfile links, try request-based download first
             result = try_download_via_request(context, url, folder)
-            if result:
-                downloaded += 1
-                continue
-
             # For /mod/resource/ links that redirect, try navigating
-            if "/mod/resource/" in url:
-                result = try_download_via_expect(page, url, folder)
-                if result:
-                    downloaded += 1
-                    continue
-
-            log.info(f"    Skipped (not downloadable)")
-            flush()
-
+            if (result is None or result["outcome"] == "failed") and "/mod/resource/" in url:
+                result = try_download_via_expect(page, url, folder) or result
         except Exception as e:
-            log.info(f"    Error: {e}")
-            flush()
+            result = {"outcome": "failed", "error": str(e)}
+        result = result or {"outcome": "not_downloadable"}
+        stats.record(course, url, result, time.perf_counter() - start)
+        if result.get("file"):
+            downloaded += 1
 
     return downloaded
 
 
+def log_summary(summary: dict):
+    log.info(f"Files: {summary['files']}  " + "  ".join(f"{k}={v}" for k, v in sorted(summary["outcomes"].items())))
+    log.info(f"Data: {summary['bytes'] / (1024 * 1024):.1f} MB in {summary['seconds']:.1f}s "
+             f"({summary['mb_per_s']:.2f} MB/s overall, {summary['transfer_mb_per_s']:.2f} MB/s transferring), "
+             f"{summary['retries']} retries")
+    for e in summary["slowest"][:3]:
+        log.info(f"  slow: {e['seconds']:.2f}s {e['file'] or e['url']} ({e['outcome']})")
+
+
 def main():
     MATERIALS_DIR.mkdir(exist_ok=True)
 
@@ -267,7 +397,6 @@ def main():
     log.info("=" * 50)
     log.info("A browser will open to HKBU Moodle.")
     log.info("Log in, then tell the assistant you're done.")
-    flush()
 
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=False, channel="chromium")
@@ -276,48 +405,52 @@ def main():
 
         page.goto(f"{MOODLE_URL}/login/index.php", timeout=30000)
         log.info("Browser opened. Please log in now...")
-        flush()
 
         if not wait_for_login(timeout_seconds=300):
             log.info("Timed out (5 min). Exiting.")
             browser.close()
+            flush_log()
             return
 
         log.info("Signal received! Proceeding...")
-        flush()
         page.goto(f"{MOODLE_URL}/my/", wait_until="networkidle", timeout=30000)
 
         log.info("Discovering courses...")
-        flush()
         courses = discover_courses(page)
 
         if not courses:
             log.info("No courses found.")
             browser.close()
+            flush_log()
             return
 
         log.info(f"Found {len(courses)} course(s):")
         for i, c in enumerate(courses, 1):
             log.info(f"  {i}. {c['name']}  ->  materials/{c['folder']}/")
-        flush()
 
         log.info("Starting downloads...")
-        flush()
+        stats = RunStats()
         total = 0
-        for course in courses:
-            count = download_course_materials(page, context, course, MATERIALS_DIR)
-            total += count
-            log.info(f"  => {count} files from this course")
-            flush()
+        try:
+            for course in courses:
+                count = download_course_materials(page, context, course, MATERIALS_DIR, stats)
+                total += count
+                log.info(f"  => {count} files from this course")
+        finally:
+            summary = stats.close()
 
         browser.close()
 
     log.info("=" * 50)
     log.info(f"Done! Downloaded {total} file(s)")
+    log_summary(summary)
     log.info(f"Files saved to: {MATERIALS_DIR}")
+    log.info(f"Per-file events: {EVENTS_FILE}, summary: {SUMMARY_FILE}")
     log.info("=" * 50)
-    flush()
+    flush_log()
+    return summary
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -0,0 +1,306 @@
+"""Deadline, quiz/lab and study-task reminders on a single timer thread.
+
+Pending reminders sit in a min-heap keyed by fire time. The thread sleeps
+on a Condition until the head is due (or an earlier reminder is pushed),
+so it does no work between reminders however many are queued. Rescheduling
+a row doesn't search the heap: the row's key gets a new version and its old
+entries are skipped when they surface (lazy deletion). The heap is rebuilt
+once skipped entries outnumber live ones.
+
+Reminders are dicts delivered to every sink's send(); sinks must not block.
+Fire times are local wall-clock times, and a reminder whose time passed
+while the server was down is not sent late.
+
+With several server processes, each runs a scheduler (so every process can
+feed its own /api/reminders/stream clients) and re-syncs from the database
+every RELOAD_SECONDS to pick up other processes' writes. Only the process
+holding the runner lock (claim_runner) gets the log and webhook sinks, so
+those fire once.
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dtime, timedelta
+from pathlib import Path
+
+from tenants import DEFAULT_USER
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server
+    fcntl = None
+
+RUNNER_LOCK_PATH = Path(__file__).resolve().parent / "data" / "reminders.lock"
+REMIND_HOUR = 9
+# Days before the event to remind on; 0 is the morning of
+LEAD_DAYS = {"deadline": (3, 1, 0), "quiz": (1,), "lab": (1,), "task": (0,)}
+# Longest single sleep, so wall-clock jumps (suspend, DST) are noticed
+MAX_SLEEP = 300
+COMPACT_MIN = 1024
+RELOAD_SECONDS = 300
+
+log = logging.getLogger("reminders")
+# Open file holding the runner lock, in the process that claimed it
+runner_lock = None
+
+
+def fire_time(day: str, days_before: int) -> float:
+    at = datetime.combine(date.fromisoformat(day) - timedelta(days=days_before), dtime(REMIND_HOUR))
+    return at.timestamp()
+
+
+def row_key(table: str, row: dict) -> tuple:
+    row_id = row["id"] if table != "weeks" else f"{row['course_id']}:{row['week_num']}"
+    return row.get("user_id", DEFAULT_USER), table, row_id
+
+
+def row_reminders(table: str, row: dict) -> list[dict]:
+    """The reminders a deadlines, weeks or study_tasks row should have; none once it's done."""
+    if not row.get("date") or row.get("done"):
+        return []
+    if table == "deadlines":
+        events = [(row.get("type") or "deadline", "deadline", row["title"])]
+    elif table == "study_tasks":
+        events = [("task", "task", row["title"])]
+    elif table == "weeks":
+        events = [(kind, kind, row.get(f"{kind}_name") or f"Week {row['week_num']} {kind}")
+                  for kind in ("quiz", "lab") if row.get(f"has_{kind}")]
+    else:
+        raise ValueError(f"no reminders for table {table}")
+    user_id, _, row_id = row_key(table, row)
+    try:
+        return [
+            {
+                "user_id": user_id, "kind": kind, "id": row_id, "course_id": row.get("course_id"),
+                "title": title, "date": row["date"], "days_before": days,
+                "fire_at": fire_time(row["date"], days),
+            }
+            for kind, lead, title in events for days in LEAD_DAYS[lead]
+        ]
+    except ValueError:
+        log.warning("skipping reminders for %s %s: bad date %r", table, row_id, row["date"])
+        return []
+
+
+def claim_runner(lock_path: Path = RUNNER_LOCK_PATH) -> bool:
+    """True in the one process that holds lock_path; the lock is kept until the process exits."""
+    global runner_lock
+    if fcntl is None:
+        return True
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    f = open(lock_path, "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    runner_lock = f
+    return True
+
+
+class ReminderScheduler:
+    def __init__(self, sinks, clock=time.time):
+        self.sinks = list(sinks)
+        self.clock = clock
+        self.cond = threading.Condition()
+        # (fire_at, seq, key, version, reminder); seq breaks ties so dicts are never compared
+        self.heap: list[tuple] = []
+        # key -> (version, reminders still queued); a heap entry is live only if its version matches
+        self.live: dict[tuple, tuple[int, list[dict]]] = {}
+        self.seq = itertools.count()
+        self.stale = 0
+        self.fired = 0
+        self.stopped = False
+        self.thread = None
+
+    def start(self, loader=None, reload_seconds: float | None = None) -> "ReminderScheduler":
+        """Start the timer thread; loader(scheduler), if given, runs on it first and every reload_seconds."""
+        self.thread = threading.Thread(target=self._run, args=(loader, reload_seconds), name="reminders",
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    # ─── Scheduling ───
+
+    def set(self, key: tuple, reminders: list[dict], replace: bool = True):
+        """Make reminders the pending set for key; an empty list cancels. replace=False keeps an existing set."""
+        now = self.clock()
+        reminders = [r for r in reminders if r["fire_at"] > now]
+        with self.cond:
+            old = self.live.get(key)
+            if old is not None:
+                if not replace or old[1] == reminders:
+                    return
+                del self.live[key]
+                self.stale += len(old[1])
+            if reminders:
+                version = next(self.seq)
+                self.live[key] = (version, reminders)
+                head = self.heap[0][0] if self.heap else None
+                for r in reminders:
+                    heapq.heappush(self.heap, (r["fire_at"], next(self.seq), key, version, r))
+                if head is None or self.heap[0][0] < head:
+                    self.cond.notify()
+            self._compact()
+
+    def update(self, table: str, rows: list[dict]):
+        """Reschedule after rows were written."""
+        for row in rows:
+            self.set(row_key(table, row), row_reminders(table, row))
+
+    def sync(self, table: str, rows: list[dict]):
+        """Make table's pending reminders exactly those of rows (every upcoming row of the table)."""
+        keys = set()
+        for row in rows:
+            key = row_key(table, row)
+            keys.add(key)
+            self.set(key, row_reminders(table, row))
+        with self.cond:
+            gone = [key for key in self.live if key[1] == table and key not in keys]
+        for key in gone:
+            self.set(key, [])
+
+    def remove(self, table: str, user_id: str, row_id: str):
+        self.set((user_id, table, row_id), [])
+
+    # ─── Reads ───
+
+    def upcoming(self, user_id: str, limit: int = 50) -> list[dict]:
+        with self.cond:
+            pending = [r for key, (_, rs) in self.live.items() if key[0] == user_id for r in rs]
+        return heapq.nsmallest(limit, pending, key=lambda r: r["fire_at"])
+
+    def stats(self) -> dict:
+        with self.cond:
+            return {
+                "pending": sum(len(rs) for _, rs in self.live.values()), "heap": len(self.heap),
+                "stale": self.stale, "fired": self.fired,
+                "next_at": self.heap[0][0] if self.heap else None,
+            }
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+
+    # ─── Internals ───
+
+    def _compact(self):
+        """Rebuild without skipped entries once they outnumber live ones. Caller holds self.cond."""
+        if self.stale < COMPACT_MIN or self.stale * 2 < len(self.heap):
+            return
+        self.heap = [
+            (r["fire_at"], next(self.seq), key, version, r)
+            for key, (version, rs) in self.live.items() for r in rs
+        ]
+        heapq.heapify(self.heap)
+        self.stale = 0
+
+    def _run(self, loader, reload_seconds):
+        next_load = self.clock() if loader is not None else float("inf")
+        while True:
+            if self.clock() >= next_load:
+                try:
+                    loader(self)
+                except Exception:
+                    log.exception("loading reminders failed")
+                next_load = self.clock() + reload_seconds if reload_seconds else float("inf")
+            with self.cond:
+                while not self.stopped:
+                    now = self.clock()
+                    if self.heap and self.heap[0][0] <= now or now >= next_load:
+                        break
+                    self.cond.wait(min(self.heap[0][0] - now if self.heap else MAX_SLEEP, next_load - now, MAX_SLEEP))
+                if self.stopped:
+                    return
+                due = []
+                while self.heap and self.heap[0][0] <= now:
+                    _, _, key, version, r = heapq.heappop(self.heap)
+                    live = self.live.get(key)
+                    if live is None or live[0] != version:
+                        self.stale -= 1
+                        continue
+                    live[1].remove(r)
+                    if not live[1]:
+                        del self.live[key]
+                    due.append(r)
+                self.fired += len(due)
+            for r in due:
+                self._deliver(r)
+
+    def _deliver(self, reminder: dict):
+        for sink in self.sinks:
+            try:
+                sink.send(reminder)
+            except Exception:
+                log.exception("reminder sink %s failed", type(sink).__name__)
+
+
+# ─── Sinks ───
+
+
+class LogSink:
+    def send(self, reminder: dict):
+        when = "today" if reminder["days_before"] == 0 else f"in {reminder['days_before']} day(s)"
+        log.info("reminder for %s: %s %r %s (%s)", reminder["user_id"], reminder["kind"],
+                 reminder["title"], when, reminder["date"])
+
+
+class WebhookSink:
+    """POSTs each reminder as JSON to url, off the timer thread."""
+
+    def __init__(self, url: str, timeout: float = 5):
+        self.url = url
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(1, thread_name_prefix="reminder-webhook")
+
+    def send(self, reminder: dict):
+        self.pool.submit(self._post, reminder)
+
+    def _post(self, reminder: dict):
+        req = urllib.request.Request(
+            self.url, data=json.dumps(reminder).encode(), headers={"Content-Type": "application/json"},
+        )
+        try:
+            urllib.request.urlopen(req, timeout=self.timeout).close()
+        except Exception as exc:
+            log.warning("reminder webhook %s failed: %s", self.url, exc)
+
+
+class SseSink:
+    """Fans reminders out to each student's open /api/reminders/stream connections."""
+
+    def __init__(self, backlog: int = 100):
+        self.backlog = backlog
+        self.lock = threading.Lock()
+        self.subscribers: dict[str, set[queue.Queue]] = {}
+
+    def subscribe(self, user_id: str) -> queue.Queue:
+        q = queue.Queue(self.backlog)
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, user_id: str, q: queue.Queue):
+        with self.lock:
+            subs = self.subscribers.get(user_id)
+            if subs is not None:
+                subs.discard(q)
+                if not subs:
+                    del self.subscribers[user_id]
+
+    def send(self, reminder: dict):
+        with self.lock:
+            subs = list(self.subscribers.get(reminder["user_id"], ()))
+        for q in subs:
+            try:
+                q.put_nowait(reminder)
+            except queue.Full:
+                pass  # a stalled client misses reminders rather than holding memory
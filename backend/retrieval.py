@@ -0,0 +1,153 @@
+"""TF-IDF retrieval over extracted course material for AI assistant prompts.
+
+Extracted text is cut into overlapping chunks and indexed as sparse,
+L2-normalised TF-IDF vectors held in flat NumPy arrays (one posting list per
+term). Cosine similarity against a query therefore only touches the postings
+of the query's terms, which keeps top-k lookups over thousands of chunks in
+the low milliseconds.
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from search_index import MATERIALS_DIR, TEXT_DIRS
+
+CHUNK_CHARS = 800
+CHUNK_OVERLAP = 150
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be by can for from has have how if in into is it its of on or so such than that the
+their then there these this to was we what when where which while who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """Pack paragraphs into chunks of about `size` chars; oversized paragraphs are windowed."""
+    chunks, current = [], ""
+    for para in (p.strip() for p in re.split(r"\n\s*\n", text)):
+        if not para:
+            continue
+        if len(current) + len(para) + 2 <= size:
+            current = f"{current}\n\n{para}" if current else para
+            continue
+        if current:
+            chunks.append(current)
+        if len(para) <= size:
+            current = para
+            continue
+        step = size - overlap
+        chunks.extend(para[i:i + size] for i in range(0, len(para) - overlap, step))
+        current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class VectorIndex:
+    """Sparse TF-IDF matrix stored column-wise: postings for term t are ids/weights[indptr[t]:indptr[t+1]]."""
+
+    def __init__(self, chunks: list[dict]):
+        self.chunks = chunks
+        self.courses = np.array([c["course_id"] for c in chunks], dtype=object)
+        self.vocab: dict[str, int] = {}
+
+        rows, cols, tfs = [], [], []
+        for i, c in enumerate(chunks):
+            for term, n in Counter(tokenize(c["text"])).items():
+                rows.append(i)
+                cols.append(self.vocab.setdefault(term, len(self.vocab)))
+                tfs.append(1.0 + math.log(n))
+        rows = np.asarray(rows, dtype=np.int32)
+        cols = np.asarray(cols, dtype=np.int32)
+
+        n_docs, n_terms = len(chunks), len(self.vocab)
+        df = np.bincount(cols, minlength=n_terms)
+        self.idf = (np.log((1 + n_docs) / (1 + df)) + 1.0).astype(np.float32)
+        weights = np.asarray(tfs, dtype=np.float32) * self.idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n_docs)).astype(np.float32)
+        weights /= np.where(norms > 0, norms, 1.0)[rows]
+
+        order = np.argsort(cols, kind="stable")
+        self.ids = rows[order]
+        self.weights = weights[order]
+        self.indptr = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+
+    def top_k(self, question: str, courses: set[str] | None = None, k: int = 5) -> list[dict]:
+        """Best k chunks, only from courses if given; "" stands for material not filed under a course (000/)."""
+        terms = Counter(t for t in tokenize(question) if t in self.vocab)
+        if not terms or not self.chunks:
+            return []
+        q_ids = np.fromiter((self.vocab[t] for t in terms), dtype=np.int64, count=len(terms))
+        q_w = np.fromiter(((1.0 + math.log(n)) for n in terms.values()), dtype=np.float32) * self.idf[q_ids]
+        q_w /= np.linalg.norm(q_w)
+
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for t, w in zip(q_ids, q_w):
+            lo, hi = self.indptr[t], self.indptr[t + 1]
+            scores[self.ids[lo:hi]] += self.weights[lo:hi] * w
+        if courses is not None:
+            scores[~np.isin(self.courses, list(courses))] = 0.0
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [{**self.chunks[i], "score": round(float(scores[i]), 4)} for i in best]
+
+
+def load_chunks(dirs: list[Path] = TEXT_DIRS) -> tuple[list[dict], tuple]:
+    chunks, signature = [], []
+    for d in dirs:
+        if not d.is_dir():
+            continue
+        for path in sorted(d.rglob("*_extracted.txt")):
+            st = path.stat()
+            signature.append((str(path), st.st_mtime_ns, st.st_size))
+            course_id = path.relative_to(MATERIALS_DIR).parts[0] if path.is_relative_to(MATERIALS_DIR) else ""
+            source = path.name[: -len("_extracted.txt")]
+            text = path.read_text(encoding="utf-8", errors="replace")
+            chunks.extend(
+                {"course_id": course_id, "source": source, "chunk": n, "text": t}
+                for n, t in enumerate(chunk_text(text))
+            )
+    return chunks, tuple(signature)
+
+
+class Retriever:
+    """Holds the current VectorIndex and rebuilds it when extracted files change."""
+
+    def __init__(self, dirs: list[Path] = TEXT_DIRS):
+        self.dirs = dirs
+        self.lock = threading.Lock()
+        self.index: VectorIndex | None = None
+        self.signature: tuple = ()
+
+    def _signature(self) -> tuple:
+        signature = []
+        for d in self.dirs:
+            if d.is_dir():
+                for path in sorted(d.rglob("*_extracted.txt")):
+                    st = path.stat()
+                    signature.append((str(path), st.st_mtime_ns, st.st_size))
+        return tuple(signature)
+
+    def current(self) -> VectorIndex:
+        with self.lock:
+            if self.index is None or self._signature() != self.signature:
+                chunks, self.signature = load_chunks(self.dirs)
+                self.index = VectorIndex(chunks)
+            return self.index
+
+    def top_k(self, question: str, courses: set[str] | None = None, k: int = 5) -> list[dict]:
+        return self.current().top_k(question, courses, k)
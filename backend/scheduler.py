@@ -0,0 +1,146 @@
+"""Rebalance undone study tasks onto future days under a daily hours capacity.
+
+Tasks are placed earliest-due-first, where a task's due date is the next quiz
+week (for quiz prep) or the next undone deadline of its course on or after
+the day it was planned for. Each task goes on the first day at or after
+max(start, its planned date) that still has room, so tasks that fit are left
+where they are and slipped ones fill the nearest free time. Full days are
+skipped through a union-find "next open day" structure, so a replan of
+thousands of tasks is a sort plus near-constant work per task.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, timedelta
+
+# Fixed-date events: they use up capacity but are never moved
+PINNED_CATEGORIES = {"attend", "deadline"}
+# Days with less room than this are treated as full
+MIN_SLOT_HOURS = 0.5
+NO_DUE = "9999-12-31"
+
+
+class DayPool:
+    """Remaining hours per day from `start`, with union-find jumps over full days."""
+
+    def __init__(self, start: date, daily_hours: float):
+        self.start = start
+        self.daily_hours = daily_hours
+        self.remaining: list[float] = []
+        self.parent: list[int] = []
+
+    def index(self, d: date) -> int:
+        return (d - self.start).days
+
+    def day(self, i: int) -> date:
+        return self.start + timedelta(days=i)
+
+    def _grow(self, i: int):
+        while len(self.remaining) <= i:
+            self.parent.append(len(self.remaining))
+            self.remaining.append(self.daily_hours)
+
+    def reserve(self, i: int, hours: float):
+        self._grow(i)
+        self.remaining[i] -= hours
+        if self.remaining[i] < MIN_SLOT_HOURS:
+            self.parent[i] = i + 1
+
+    def next_open(self, i: int) -> int:
+        self._grow(i)
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+            self._grow(root)
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def place(self, earliest: int, hours: float) -> int:
+        """First open day >= earliest with room for `hours` (an empty day if hours exceed a full day)."""
+        need = min(hours, self.daily_hours)
+        i = self.next_open(earliest)
+        while self.remaining[i] < need:
+            i = self.next_open(i + 1)
+        self.reserve(i, hours)
+        return i
+
+
+def due_dates(deadlines: list[dict], weeks: list[dict]):
+    """Return due(task) -> ISO date or None, backed by sorted per-course date lists."""
+    by_course = defaultdict(list)
+    for d in deadlines:
+        if not d.get("done"):
+            by_course[d["course_id"]].append(d["date"])
+    quizzes = defaultdict(list)
+    for w in weeks:
+        if w.get("has_quiz") and w.get("date"):
+            quizzes[w["course_id"]].append(w["date"])
+    for dates in (*by_course.values(), *quizzes.values()):
+        dates.sort()
+
+    def due(task: dict) -> str | None:
+        dates = quizzes if task.get("category") == "quiz-prep" else by_course
+        course_dates = dates.get(task.get("course_id"), [])
+        i = bisect_left(course_dates, task["date"])
+        return course_dates[i] if i < len(course_dates) else None
+
+    return due
+
+
+def parse_day(value) -> date | None:
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def plan(tasks: list[dict], deadlines: list[dict], weeks: list[dict], daily_hours: float = 4.0,
+         start: date | None = None, class_hours: float = 3.0) -> dict:
+    """Compute a rebalanced schedule. Nothing is written; see apply in app.py."""
+    start = start or date.today()
+    start_iso = start.isoformat()
+    pool = DayPool(start, daily_hours)
+    due = due_dates(deadlines, weeks)
+
+    movable = []
+    attended = set()
+    for t in tasks:
+        # Undated (or malformed) tasks aren't on the calendar, so there is nothing to move
+        if t.get("done") or parse_day(t.get("date")) is None:
+            continue
+        if t.get("category") in PINNED_CATEGORIES:
+            if t["date"] >= start_iso:
+                pool.reserve(pool.index(date.fromisoformat(t["date"])), float(t.get("hours") or 0))
+                attended.add((t.get("course_id"), t["date"]))
+            continue
+        movable.append(t)
+
+    # Class days without an explicit attend task still cost the class time
+    for w in weeks:
+        day = parse_day(w.get("date"))
+        if day and w["date"] >= start_iso and w.get("status") != "holiday" \
+                and (w["course_id"], w["date"]) not in attended:
+            pool.reserve(pool.index(day), class_hours)
+
+    keyed = [(due(t) or NO_DUE, t["date"], t["id"], t) for t in movable]
+    keyed.sort(key=lambda k: k[:3])
+
+    moves, late = [], []
+    for due_date, planned, _, t in keyed:
+        earliest = max(0, pool.index(date.fromisoformat(planned)))
+        new_date = pool.day(pool.place(earliest, float(t.get("hours") or 1))).isoformat()
+        is_late = new_date > due_date
+        if new_date != planned:
+            moves.append({
+                "id": t["id"], "title": t.get("title"), "course_id": t.get("course_id"),
+                "from": planned, "to": new_date, "due": None if due_date == NO_DUE else due_date, "late": is_late,
+            })
+        if is_late:
+            late.append(t["id"])
+
+    load = {
+        pool.day(i).isoformat(): round(daily_hours - rem, 2)
+        for i, rem in enumerate(pool.remaining) if rem < daily_hours
+    }
+    return {"start": start_iso, "daily_hours": daily_hours, "moves": moves, "late": late, "load": load}
@@ -0,0 +1,186 @@
+"""Full-text search over extracted course materials, week topics and study tasks.
+
+Backed by SQLite FTS5 tables ranked with BM25. Every indexed item has a
+source key and a fingerprint, so syncing only rewrites items that changed.
+
+Extracted materials are shared by every student, so they live in one
+shared index (INDEX_PATH). Each student's weeks and tasks get a small index
+of their own. A search queries both and merges by score (search_all), so its
+cost depends on the materials and one student's rows, not on the cohort.
+BM25 scores from the two indexes use different corpus statistics, so the
+merged order is approximate.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+INDEX_PATH = BACKEND_DIR / "data" / "search.sqlite"
+TENANT_INDEX_DIR = BACKEND_DIR / "data" / "search"
+TEXT_DIRS = [BACKEND_DIR.parent / "000", BACKEND_DIR / "materials"]
+MATERIALS_DIR = BACKEND_DIR / "materials"
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5(
+    title, body,
+    kind UNINDEXED, course_id UNINDEXED, ref UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS sources (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    doc_rowid INTEGER NOT NULL
+);
+"""
+
+
+def index_path(user_id: str) -> Path:
+    """The student's weeks-and-tasks index; materials are in the shared INDEX_PATH."""
+    return TENANT_INDEX_DIR / f"{user_id}.sqlite"
+
+
+def fingerprint(*parts) -> str:
+    return hashlib.sha1("\x1f".join("" if p is None else str(p) for p in parts).encode()).hexdigest()
+
+
+def to_match_query(q: str) -> str:
+    """Turn free text into an FTS5 query: every term must match, last term as a prefix."""
+    terms = ["".join(ch for ch in t if ch.isalnum()) for t in q.split()]
+    terms = [t for t in terms if t]
+    if not terms:
+        return ""
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class SearchIndex:
+    def __init__(self, path: Path = INDEX_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    # ─── Writes ───
+
+    def _upsert(self, key, fp, kind, course_id, title, body, ref) -> bool:
+        row = self.conn.execute("SELECT fingerprint, doc_rowid FROM sources WHERE key = ?", (key,)).fetchone()
+        if row and row[0] == fp:
+            return False
+        if row:
+            self.conn.execute("DELETE FROM docs WHERE rowid = ?", (row[1],))
+        cur = self.conn.execute(
+            "INSERT INTO docs (title, body, kind, course_id, ref) VALUES (?, ?, ?, ?, ?)",
+            (title or "", body or "", kind, course_id or "", str(ref)),
+        )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sources (key, fingerprint, doc_rowid) VALUES (?, ?, ?)",
+            (key, fp, cur.lastrowid),
+        )
+        return True
+
+    def _remove(self, key):
+        row = self.conn.execute("SELECT doc_rowid FROM sources WHERE key = ?", (key,)).fetchone()
+        if row:
+            self.conn.execute("DELETE FROM docs WHERE rowid = ?", (row[0],))
+            self.conn.execute("DELETE FROM sources WHERE key = ?", (key,))
+
+    def _sync(self, prefix: str, items: list[tuple]) -> int:
+        """Upsert (key, fingerprint, kind, course_id, title, body, ref) items and drop stale keys under prefix."""
+        changed = 0
+        with self.lock, self.conn:
+            keep = set()
+            for item in items:
+                keep.add(item[0])
+                changed += self._upsert(*item)
+            stale = [k for (k,) in self.conn.execute("SELECT key FROM sources WHERE key LIKE ?", (prefix + "%",))
+                     if k not in keep]
+            for key in stale:
+                self._remove(key)
+        return changed + len(stale)
+
+    def sync_files(self, dirs: list[Path] = TEXT_DIRS) -> int:
+        items = []
+        for d in dirs:
+            if not d.is_dir():
+                continue
+            for path in d.rglob("*_extracted.txt"):
+                st = path.stat()
+                fp = fingerprint(st.st_mtime_ns, st.st_size)
+                key = f"file:{path}"
+                if self._fingerprint(key) == fp:
+                    items.append((key, fp, None, None, None, None, None))
+                    continue
+                course_id = ""
+                if path.is_relative_to(MATERIALS_DIR):
+                    course_id = path.relative_to(MATERIALS_DIR).parts[0]
+                title = path.name[: -len("_extracted.txt")]
+                body = path.read_text(encoding="utf-8", errors="replace")
+                items.append((key, fp, "material", course_id, title, body, path.name))
+        return self._sync("file:", items)
+
+    def sync_weeks(self, weeks: list[dict]) -> int:
+        return self._sync("week:", [
+            (f"week:{w['course_id']}:{w['week_num']}", fingerprint(w.get("topic"), w.get("details")),
+             "week", w["course_id"], w.get("topic"), w.get("details"), w["week_num"])
+            for w in weeks
+        ])
+
+    def sync_tasks(self, tasks: list[dict]) -> int:
+        return self._sync("task:", [self._task_item(t) for t in tasks])
+
+    def upsert_task(self, task: dict):
+        with self.lock, self.conn:
+            self._upsert(*self._task_item(task))
+
+    def remove_task(self, task_id: str):
+        with self.lock, self.conn:
+            self._remove(f"task:{task_id}")
+
+    @staticmethod
+    def _task_item(t: dict) -> tuple:
+        return (f"task:{t['id']}", fingerprint(t.get("title"), t.get("course_id"), t.get("date")),
+                "task", t.get("course_id"), t.get("title"), t.get("date"), t["id"])
+
+    def drop(self, prefix: str) -> int:
+        """Remove every item under prefix, e.g. left over from before materials had their own index."""
+        return self._sync(prefix, [])
+
+    def _fingerprint(self, key: str) -> str | None:
+        with self.lock:
+            row = self.conn.execute("SELECT fingerprint FROM sources WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # ─── Reads ───
+
+    def search(self, q: str, course_id: str | None = None, limit: int = 20) -> list[dict]:
+        match = to_match_query(q)
+        if not match:
+            return []
+        sql = (
+            "SELECT kind, course_id, ref, "
+            "highlight(docs, 0, '<mark>', '</mark>'), "
+            "snippet(docs, 1, '<mark>', '</mark>', '…', 16), "
+            "bm25(docs, 5.0, 1.0) AS score "
+            "FROM docs WHERE docs MATCH ?"
+        )
+        params = [match]
+        if course_id:
+            sql += " AND course_id = ?"
+            params.append(course_id)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [
+            {"kind": kind, "course_id": cid, "ref": ref, "title": title, "snippet": snippet, "score": round(-score, 4)}
+            for kind, cid, ref, title, snippet, score in rows
+        ]
+
+
+def search_all(indexes: list[SearchIndex], q: str, course_id: str | None = None, limit: int = 20) -> list[dict]:
+    """The best limit results over several indexes, by score."""
+    results = [r for index in indexes for r in index.search(q, course_id, limit)]
+    return sorted(results, key=lambda r: r["score"], reverse=True)[:limit]
@@ -0,0 +1,143 @@
+"""Progress rollups: planned and completed hours per course, week, category and day.
+
+The rollups are loaded once from study_tasks and then kept current by the
+task mutation handlers, which pass the old and new row of every change.
+Day totals also keep prefix sums (rebuilt lazily per course after a change)
+so any date range is two binary searches and a subtraction.
+
+Each process holds its own copy, so the app is deployed as a single
+gunicorn worker (see render.yaml). With more workers, the full reload every
+RELOAD_SECONDS is the only way changes made by the other workers are seen.
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import accumulate
+
+RELOAD_SECONDS = 300
+ALL = "*"
+
+
+class Totals:
+    __slots__ = ("planned_hours", "completed_hours", "tasks", "completed_tasks")
+
+    def __init__(self):
+        self.planned_hours = self.completed_hours = 0.0
+        self.tasks = self.completed_tasks = 0
+
+    def add(self, hours: float, done: bool, sign: int):
+        self.planned_hours += sign * hours
+        self.tasks += sign
+        if done:
+            self.completed_hours += sign * hours
+            self.completed_tasks += sign
+
+    def to_dict(self) -> dict:
+        return {
+            "planned_hours": round(self.planned_hours, 2), "completed_hours": round(self.completed_hours, 2),
+            "tasks": self.tasks, "completed_tasks": self.completed_tasks,
+        }
+
+
+class ProgressRollups:
+    def __init__(self, reload_seconds: int = RELOAD_SECONDS):
+        self.lock = threading.Lock()
+        self.reload_seconds = reload_seconds
+        self.loaded_at = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.courses = defaultdict(Totals)
+        self.weeks = defaultdict(Totals)          # (course_id, week_num)
+        self.categories = defaultdict(Totals)     # (course_id, category), course "*" = all courses
+        self.days = defaultdict(Totals)           # (course_id, date), course "*" = all courses
+        self.week_starts: dict[str, tuple[list[str], list[int]]] = {}
+        self.prefix: dict[str, tuple] = {}
+
+    def stale(self) -> bool:
+        return time.monotonic() - self.loaded_at > self.reload_seconds
+
+    def load(self, tasks: list[dict], weeks: list[dict]):
+        with self.lock:
+            self._reset()
+            by_course = defaultdict(list)
+            for w in weeks:
+                if w.get("date"):
+                    by_course[w["course_id"]].append((w["date"], w["week_num"]))
+            for course_id, starts in by_course.items():
+                starts.sort()
+                self.week_starts[course_id] = ([d for d, _ in starts], [n for _, n in starts])
+            for t in tasks:
+                self._apply(t, 1)
+            self.loaded_at = time.monotonic()
+
+    def replace(self, old: dict | None, new: dict | None):
+        """Fold one mutation in: old is the row before the change, new the row after (None for insert/delete)."""
+        with self.lock:
+            if old:
+                self._apply(old, -1)
+            if new:
+                self._apply(new, 1)
+
+    def _week_of(self, course_id: str, day: str) -> int:
+        dates, nums = self.week_starts.get(course_id, ([], []))
+        i = bisect_right(dates, day) - 1
+        return nums[i] if i >= 0 else 0
+
+    def _apply(self, t: dict, sign: int):
+        hours, done = float(t.get("hours") or 0), bool(t.get("done"))
+        course_id, day, category = t.get("course_id") or "", t.get("date") or "", t.get("category") or ""
+        self.courses[course_id].add(hours, done, sign)
+        self.weeks[(course_id, self._week_of(course_id, day))].add(hours, done, sign)
+        for scope in (course_id, ALL):
+            self.categories[(scope, category)].add(hours, done, sign)
+            self.days[(scope, day)].add(hours, done, sign)
+            self.prefix.pop(scope, None)
+
+    def _prefix(self, scope: str) -> tuple:
+        cached = self.prefix.get(scope)
+        if cached is None:
+            items = sorted((d, t) for (s, d), t in self.days.items() if s == scope)
+            dates = [d for d, _ in items]
+            planned = [0.0, *accumulate(t.planned_hours for _, t in items)]
+            completed = [0.0, *accumulate(t.completed_hours for _, t in items)]
+            cached = self.prefix[scope] = (dates, planned, completed)
+        return cached
+
+    # ─── Reads ───
+
+    def course_counts(self, course_id: str) -> Totals:
+        with self.lock:
+            return self.courses.get(course_id) or Totals()
+
+    def range_totals(self, start: str | None, end: str | None, course_id: str | None = None) -> dict:
+        with self.lock:
+            dates, planned, completed = self._prefix(course_id or ALL)
+            lo = bisect_left(dates, start) if start else 0
+            hi = bisect_right(dates, end) if end else len(dates)
+            hi = max(lo, hi)
+            return {
+                "from": start, "to": end,
+                "planned_hours": round(planned[hi] - planned[lo], 2),
+                "completed_hours": round(completed[hi] - completed[lo], 2),
+            }
+
+    def snapshot(self, course_id: str | None = None, start: str | None = None, end: str | None = None) -> dict:
+        scope = course_id or ALL
+        with self.lock:
+            courses = {c: t.to_dict() for c, t in self.courses.items() if t.tasks and (not course_id or c == course_id)}
+            weeks = defaultdict(dict)
+            for (c, n), t in self.weeks.items():
+                if t.tasks and (not course_id or c == course_id):
+                    weeks[c][n] = t.to_dict()
+            categories = {cat: t.to_dict() for (s, cat), t in self.categories.items() if s == scope and t.tasks}
+            days = {
+                d: t.to_dict() for (s, d), t in self.days.items()
+                if s == scope and t.tasks and (not start or d >= start) and (not end or d <= end)
+            }
+        return {
+            "courses": courses, "weeks": weeks, "categories": categories, "days": dict(sorted(days.items())),
+            "range": self.range_totals(start, end, course_id),
+        }
@@ -0,0 +1,150 @@
+"""Local extractive summaries of extracted course material (TextRank).
+
+A document is split into sentences (slide bullets count as sentences). The
+sentences become L2-normalised TF-IDF rows of a dense NumPy matrix, so the
+whole cosine-similarity graph is one matrix product. PageRank over that
+graph, by power iteration, scores each sentence by how much of the rest of
+the document it echoes. The top sentences are kept in their original
+order, up to a sentence and character budget.
+
+Summaries are cached in SQLite under the SHA-256 of the input text plus the
+summarizer version and budget. Re-summarizing an unchanged document, or
+one shared by several weeks or students, is a single lookup.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from retrieval import tokenize
+
+SUMMARY_PATH = Path(__file__).resolve().parent / "data" / "summaries.sqlite"
+# Bump when the output for the same input changes
+SUMMARIZER_VERSION = "1"
+
+MAX_SENTENCES = 12
+MAX_CHARS = 2000
+# Longest documents are cut to this many sentences before ranking; the graph is n x n
+MAX_INPUT_SENTENCES = 2000
+MAX_TERMS = 4000
+MIN_TOKENS = 4
+DAMPING = 0.85
+
+MARKER_RE = re.compile(r"^\[(?:page|slide|cell|section|block) \d+\]$", re.MULTILINE)
+# Sentence ends, line breaks, and the bullet glyphs PDF extraction leaves inline
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])|\n+|\s*[•▪●◦Ø§¡]\s*")
+
+
+def split_sentences(text: str) -> list[str]:
+    """Sentences and bullet lines with at least MIN_TOKENS content words, first occurrence only."""
+    seen, sentences = set(), []
+    for raw in SENTENCE_RE.split(MARKER_RE.sub("", text)):
+        sentence = " ".join(raw.strip(" \t-*").split())
+        key = sentence.lower()
+        if len(tokenize(sentence)) >= MIN_TOKENS and key not in seen:
+            seen.add(key)
+            sentences.append(sentence)
+    return sentences[:MAX_INPUT_SENTENCES]
+
+
+def sentence_matrix(sentences: list[str]) -> np.ndarray:
+    """Rows are L2-normalised TF-IDF vectors over the MAX_TERMS most widespread terms."""
+    tokens = [tokenize(s) for s in sentences]
+    df = Counter(t for toks in tokens for t in set(toks))
+    vocab = {t: i for i, (t, _) in enumerate(df.most_common(MAX_TERMS))}
+    n = len(sentences)
+    x = np.zeros((n, len(vocab)), dtype=np.float32)
+    for row, toks in enumerate(tokens):
+        for t, count in Counter(toks).items():
+            col = vocab.get(t)
+            if col is not None:
+                x[row, col] = count
+    idf = np.log((1 + n) / (1 + np.array([df[t] for t in vocab], dtype=np.float32))) + 1
+    x *= idf
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+
+def textrank(sentences: list[str], iterations: int = 50, tol: float = 1e-6) -> np.ndarray:
+    """PageRank score per sentence over the cosine-similarity graph."""
+    n = len(sentences)
+    if n <= 2:
+        return np.ones(n, dtype=np.float32)
+    x = sentence_matrix(sentences)
+    sim = x @ x.T
+    np.fill_diagonal(sim, 0)
+    out = sim.sum(axis=1, keepdims=True)
+    # Sentences sharing no terms with any other link everywhere equally
+    transition = np.where(out > 0, sim / np.where(out == 0, 1, out), 1 / n)
+    scores = np.full(n, 1 / n, dtype=np.float32)
+    for _ in range(iterations):
+        updated = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def summarize_text(text: str, max_sentences: int = MAX_SENTENCES, max_chars: int = MAX_CHARS) -> str:
+    sentences = split_sentences(text)
+    if not sentences:
+        return ""
+    ranked = np.argsort(-textrank(sentences), kind="stable")
+    chosen, chars = [], 0
+    for i in ranked:
+        if len(chosen) == max_sentences:
+            break
+        if chars + len(sentences[i]) > max_chars and chosen:
+            continue
+        chosen.append(i)
+        chars += len(sentences[i]) + 1
+    return "\n".join(sentences[i] for i in sorted(chosen))
+
+
+class SummaryCache:
+    """summarize_text() behind a content-hash keyed SQLite cache."""
+
+    def __init__(self, path: Path = SUMMARY_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL, "
+            "input_chars INTEGER, created_at TEXT DEFAULT CURRENT_TIMESTAMP)"
+        )
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def key(text: str, max_sentences: int, max_chars: int) -> str:
+        h = hashlib.sha256(text.encode())
+        h.update(f"\x1e{SUMMARIZER_VERSION}:{max_sentences}:{max_chars}".encode())
+        return h.hexdigest()
+
+    def summarize(self, text: str, max_sentences: int = MAX_SENTENCES,
+                  max_chars: int = MAX_CHARS) -> tuple[str, bool]:
+        """(summary, served_from_cache)"""
+        key = self.key(text, max_sentences, max_chars)
+        with self.lock:
+            row = self.conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.hits += 1
+                return row[0], True
+            self.misses += 1
+        summary = summarize_text(text, max_sentences, max_chars)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, input_chars) VALUES (?, ?, ?)",
+                (key, summary, len(text)),
+            )
+        return summary, False
+
+    def stats(self) -> dict:
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
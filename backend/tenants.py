@@ -0,0 +1,80 @@
+"""Per-student tenancy: who a request is for, and lazily built per-student state.
+
+Each request carries the student in the X-User-Id header (requests without
+one belong to DEFAULT_USER, which is also the owner of all pre-tenancy
+rows). The header is not authenticated: it only partitions data, so it is
+safe only behind a proxy that authenticates students and sets it. With a
+USER_TOKEN_SECRET the student instead comes from a signed token
+(sign_user), and the header is ignored. Caches that summarise a student's rows live in a TenantCache, so a
+request only ever touches, loads or rebuilds the state of its own student.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+DEFAULT_USER = "default"
+USER_HEADER = "X-User-Id"
+MAX_TENANTS = 1000
+
+USER_ID_RE = re.compile(r"[A-Za-z0-9_.@-]{1,64}")
+
+
+def user_id_from(headers) -> str | None:
+    """The request's user id, DEFAULT_USER if absent, None if malformed."""
+    user_id = (headers.get(USER_HEADER) or "").strip() or DEFAULT_USER
+    return user_id if USER_ID_RE.fullmatch(user_id) else None
+
+
+def sign_user(user_id: str, secret: str) -> str:
+    """A bearer token for user_id: "<user_id>.<HMAC-SHA256 of it under secret>"."""
+    mac = hmac.new(secret.encode(), user_id.encode(), hashlib.sha256).digest()
+    return f"{user_id}.{base64.urlsafe_b64encode(mac).decode().rstrip('=')}"
+
+
+def user_from_token(token: str | None, secret: str) -> str | None:
+    """The user id a token from sign_user was issued for, None if it's missing or forged."""
+    user_id, _, _ = (token or "").rpartition(".")
+    if not USER_ID_RE.fullmatch(user_id) or not hmac.compare_digest(token, sign_user(user_id, secret)):
+        return None
+    return user_id
+
+
+class TenantCache:
+    """factory(user_id) objects, built on first use; least recently used evicted past max_tenants."""
+
+    def __init__(self, factory, max_tenants: int = MAX_TENANTS):
+        self.factory = factory
+        self.max_tenants = max_tenants
+        self.lock = threading.Lock()
+        self.items: OrderedDict[str, object] = OrderedDict()
+
+    def get(self, user_id: str):
+        with self.lock:
+            item = self.items.get(user_id)
+            if item is not None:
+                self.items.move_to_end(user_id)
+                return item
+        # Built outside the lock: factories may do I/O
+        item = self.factory(user_id)
+        with self.lock:
+            item = self.items.setdefault(user_id, item)
+            self.items.move_to_end(user_id)
+            while len(self.items) > self.max_tenants:
+                self.items.popitem(last=False)
+        return item
+
+    def __len__(self):
+        return len(self.items)
+
+
+if __name__ == "__main__":
+    # python tenants.py <user_id>: print the student's token for the USER_TOKEN_SECRET in the environment
+    if len(sys.argv) != 2 or not os.environ.get("USER_TOKEN_SECRET"):
+        sys.exit("usage: USER_TOKEN_SECRET=... python tenants.py <user_id>")
+    print(sign_user(sys.argv[1], os.environ["USER_TOKEN_SECRET"]))
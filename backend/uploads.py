@@ -0,0 +1,106 @@
+"""Streaming material uploads.
+
+Flask normally spools multipart files to a temporary file and the handler
+then copies them again. UploadRequest instead hands the multipart parser a
+HashingFile that lives next to backend/materials, so each chunk is hashed
+and written to disk once as it arrives and the finished file is moved into
+place with a rename.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from flask import Request
+from werkzeug.utils import secure_filename
+
+MATERIALS_DIR = Path(__file__).resolve().parent / "materials"
+UPLOAD_TMP_DIR = MATERIALS_DIR / ".uploads"
+CHUNK_SIZE = 1 << 20
+
+
+class HashingFile:
+    """Temporary upload file that hashes bytes as they are written."""
+
+    def __init__(self, directory: Path = UPLOAD_TMP_DIR):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=directory, prefix="upload-", delete=False)
+        self.path = Path(self.file.name)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.kept = False
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def discard(self):
+        self.file.close()
+        if not self.kept:
+            self.path.unlink(missing_ok=True)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFile()
+
+
+def discard_uploads(files):
+    """Remove temporary upload files the request handler didn't keep."""
+    for storage in files.values():
+        if isinstance(storage.stream, HashingFile):
+            storage.stream.discard()
+
+
+def store_upload(upload: HashingFile, course_id: str, filename: str) -> tuple[Path, bool]:
+    """Move a finished upload to materials/<course_id>/<filename>.
+
+    Returns (path, created). Re-uploading identical content reuses the
+    existing file; a different file with the same name gets a hash suffix.
+    """
+    upload.file.flush()
+    os.fsync(upload.file.fileno())
+    upload.file.close()
+    digest = upload.sha256.hexdigest()
+
+    folder = MATERIALS_DIR / (secure_filename(course_id) or "misc")
+    folder.mkdir(parents=True, exist_ok=True)
+    name = secure_filename(filename) or f"{digest[:12]}.bin"
+    target = folder / name
+    if target.exists():
+        if target.stat().st_size == upload.size and file_sha256(target) == digest:
+            upload.path.unlink(missing_ok=True)
+            upload.kept = True
+            return target, False
+        target = folder / f"{target.stem}-{digest[:8]}{target.suffix}"
+    os.replace(upload.path, target)
+    upload.kept = True
+    return target, True
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def resolve_material_path(file_path: str | None) -> Path | None:
+    """Absolute path for a stored material, refusing anything outside materials/."""
+    if not file_path:
+        return None
+    path = (MATERIALS_DIR / file_path).resolve()
+    if not path.is_relative_to(MATERIALS_DIR) or not path.is_file():
+        return None
+    return path
+
+
+def material_type(filename: str) -> str:
+    """A material's type from its file name: the lower-case extension ("pdf", "pptx", ...), or "file"."""
+    return Path(filename).suffix.lower().lstrip(".") or "file"
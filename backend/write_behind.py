@@ -0,0 +1,177 @@
+"""Optional write-behind buffer for the toggle endpoints (WRITE_BEHIND=1).
+
+A toggle is applied to an in-memory copy of the row and acknowledged at
+once. Rows changed since the last flush are written to Supabase together,
+one upsert per table, every FLUSH_SECONDS and again at interpreter exit.
+Toggling a row several times between flushes costs one write of its final
+state, or none if it ends up back where it started.
+
+Durability, stated plainly:
+- An acknowledged toggle is only in this process's memory until the next
+  flush. A crash, OOM kill or SIGKILL loses at most FLUSH_SECONDS of
+  toggles. A clean shutdown (SIGTERM to gunicorn, Ctrl-C) flushes them.
+- A failed flush keeps the rows pending and retries on the next tick.
+- The view is per process. Run a single worker with WRITE_BEHIND=1,
+  otherwise other workers can read pre-toggle values for up to
+  FLUSH_SECONDS and may toggle from them.
+- Writes that bypass the buffer call settle() first, which flushes and
+  drops cached rows, so a pending full-row upsert can't overwrite them.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+FLUSH_SECONDS = 0.5
+# Clean rows kept so a toggle needn't read first; short-lived because other writers can change them
+CACHE_SECONDS = 30
+CACHE_ROWS = 5000
+
+log = logging.getLogger("write_behind")
+
+
+class WriteBehind:
+    def __init__(self, supabase, flush_seconds: float = FLUSH_SECONDS,
+                 cache_seconds: float = CACHE_SECONDS, cache_rows: int = CACHE_ROWS):
+        self.supabase = supabase
+        self.flush_seconds = flush_seconds
+        self.cache_seconds = cache_seconds
+        self.cache_rows = cache_rows
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        # (table, user_id, id) -> (row, cached_at); the row is authoritative while the key is dirty
+        self.rows: OrderedDict[tuple, tuple[dict, float]] = OrderedDict()
+        # (table, user_id, id) -> row as last stored, to drop toggles that cancel out
+        self.dirty: dict[tuple, dict] = {}
+        self.flushes = self.rows_written = self.coalesced = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    # ─── Reads ───
+
+    def get(self, table: str, user_id: str, row_id: str) -> dict | None:
+        key = (table, user_id, row_id)
+        with self.lock:
+            entry = self.rows.get(key)
+            if entry is None:
+                return None
+            if key not in self.dirty and time.monotonic() - entry[1] > self.cache_seconds:
+                del self.rows[key]
+                return None
+            return dict(entry[0])
+
+    def overlay(self, table: str, rows: list[dict], cache: bool = True) -> list[dict]:
+        """Swap in pending versions so reads see unflushed toggles, and cache the other rows.
+
+        Rows with only some columns (cache=False) get just those columns of the pending version.
+        """
+        now = time.monotonic()
+        with self.lock:
+            result = []
+            for row in rows:
+                key = (table, row["user_id"], row["id"])
+                if key in self.dirty:
+                    pending = self.rows[key][0]
+                    result.append(dict(pending) if cache else {k: pending.get(k, v) for k, v in row.items()})
+                    continue
+                if not cache:
+                    result.append(row)
+                    continue
+                self.rows[key] = (dict(row), now)
+                self.rows.move_to_end(key)
+                result.append(row)
+            self._trim()
+            return result
+
+    # ─── Writes ───
+
+    def update(self, table: str, row: dict, changes: dict) -> dict:
+        """Apply changes to the in-memory row and queue it for the next flush; returns the new row."""
+        key = (table, row["user_id"], row["id"])
+        with self.lock:
+            entry = self.rows.get(key)
+            current = entry[0] if entry and key in self.dirty else dict(row)
+            if key in self.dirty:
+                self.coalesced += 1
+            else:
+                self.dirty[key] = dict(current)
+            new = {**current, **changes}
+            self.rows[key] = (new, time.monotonic())
+            self.rows.move_to_end(key)
+            return dict(new)
+
+    def settle(self, table: str, user_id: str, row_ids=None):
+        """Before writing around the buffer: flush pending rows and forget cached ones."""
+        self.flush()
+        with self.lock:
+            if row_ids is None:
+                stale = [k for k in self.rows if k[0] == table and k[1] == user_id and k not in self.dirty]
+            else:
+                stale = [(table, user_id, i) for i in row_ids if (table, user_id, i) not in self.dirty]
+            for key in stale:
+                self.rows.pop(key, None)
+
+    def flush(self) -> int:
+        """Write every pending row, one upsert per table; returns the number of rows written."""
+        with self.flush_lock:
+            with self.lock:
+                if not self.dirty:
+                    return 0
+                batch = {key: dict(self.rows[key][0]) for key in self.dirty}
+                originals = self.dirty
+                self.dirty = {}
+            by_table: dict[str, list[tuple]] = {}
+            for key, row in batch.items():
+                if row != originals[key]:
+                    by_table.setdefault(key[0], []).append((key, row))
+            written = 0
+            for table, items in by_table.items():
+                try:
+                    self.supabase.table(table).upsert([row for _, row in items]).execute()
+                    written += len(items)
+                except Exception:
+                    log.exception("write-behind flush of %d %s rows failed, will retry", len(items), table)
+                    with self.lock:
+                        for key, _ in items:
+                            # A newer toggle may have re-dirtied the key; keep the older stored copy
+                            self.dirty[key] = originals[key]
+            with self.lock:
+                self.flushes += 1
+                self.rows_written += written
+                self._trim()
+            return written
+
+    def close(self):
+        self.stopped.set()
+        self.flush()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "pending": len(self.dirty), "cached_rows": len(self.rows), "flushes": self.flushes,
+                "rows_written": self.rows_written, "coalesced": self.coalesced,
+                "flush_seconds": self.flush_seconds,
+            }
+
+    # ─── Internals ───
+
+    def _run(self):
+        while not self.stopped.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("write-behind flush failed")
+
+    def _trim(self):
+        """Drop the oldest clean rows past cache_rows. Caller holds self.lock."""
+        if len(self.rows) <= self.cache_rows:
+            return
+        for key in list(self.rows):
+            if len(self.rows) <= self.cache_rows:
+                break
+            if key not in self.dirty:
+                del self.rows[key]
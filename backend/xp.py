@@ -0,0 +1,92 @@
+"""Append-only XP ledger with a cached running total and level calculation.
+
+Every XP change is its own insert into xp_ledger, so concurrent completions
+from different gunicorn workers never overwrite each other. Each process
+keeps a running total and only reads ledger rows newer than the ones it has
+already summed. Rows can become visible out of order when inserts commit
+concurrently, so the student's rows from the last LOOKBACK_SECONDS before
+the newest one seen are re-read and skipped by id if already counted. The
+window is in time, not ids: ids come from one sequence shared by every
+student, so a busy cohort could push a late row out of an id window.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+from tenants import DEFAULT_USER
+
+LEVELS = [
+    (0, "Beginner"),
+    (100, "Apprentice"),
+    (250, "Scholar"),
+    (500, "Expert"),
+    (1000, "Master"),
+    (2000, "Grandmaster"),
+]
+# Rows created this long before the newest seen are re-read in case they committed late
+LOOKBACK_SECONDS = 300
+
+
+def level_for(xp: int) -> dict:
+    index = max(i for i, (threshold, _) in enumerate(LEVELS) if xp >= threshold) if xp >= 0 else 0
+    threshold, name = LEVELS[index]
+    next_threshold = LEVELS[index + 1][0] if index + 1 < len(LEVELS) else None
+    return {
+        "xp": xp,
+        "level": index + 1,
+        "level_name": name,
+        "level_xp": threshold,
+        "next_level_xp": next_threshold,
+        "progress": round((xp - threshold) / (next_threshold - threshold), 4) if next_threshold else 1.0,
+    }
+
+
+class XpLedger:
+    """One student's XP: ledger rows are filtered and written with their user_id."""
+
+    def __init__(self, supabase, user_id: str = DEFAULT_USER):
+        self.supabase = supabase
+        self.user_id = user_id
+        self.lock = threading.Lock()
+        self.total = 0
+        # Newest created_at summed so far, None until the first full read
+        self.high_water: str | None = None
+        # id -> created_at of rows inside the lookback window that are already in total
+        self.recent: dict[int, str] = {}
+
+    def award(self, delta: int, reason: str, ref: str | None = None) -> dict:
+        row = {
+            "user_id": self.user_id, "delta": delta, "reason": reason, "ref": ref,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        inserted = self.supabase.table("xp_ledger").insert(row).execute().data[0]
+        self.refresh()
+        return inserted
+
+    def refresh(self) -> int:
+        """Fold ledger rows this process hasn't summed yet into the running total."""
+        with self.lock:
+            query = self.supabase.table("xp_ledger").select("id,delta,created_at").eq("user_id", self.user_id)
+            if self.high_water is not None:
+                query = query.gte("created_at", self.window_start())
+            for row in query.order("id").execute().data:
+                if row["id"] in self.recent:
+                    continue
+                self.total += row["delta"]
+                created_at = row["created_at"] or ""
+                self.recent[row["id"]] = created_at
+                if self.high_water is None or created_at > self.high_water:
+                    self.high_water = created_at
+            self.high_water = self.high_water or ""
+            start = self.window_start()
+            self.recent = {i: at for i, at in self.recent.items() if at >= start}
+            return self.total
+
+    def window_start(self) -> str:
+        if not self.high_water:
+            return ""
+        newest = datetime.fromisoformat(self.high_water)
+        return (newest - timedelta(seconds=LOOKBACK_SECONDS)).isoformat(timespec="seconds")
+
+    def summary(self) -> dict:
+        return level_for(self.refresh())
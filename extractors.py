@@ -0,0 +1,122 @@
+"""Text extractors for course material, keyed by file suffix.
+
+Each extractor yields the text of a file one unit at a time: a slide, a
+notebook cell, a document section. read_pdf.py writes the units to the shared
+<name>_extracted.txt format with a "[slide 3]" style marker before each one.
+Extractors whose library isn't installed stay registered but unavailable, so
+the batch can say what to install instead of silently skipping the files.
+"""
+
+import csv
+import json
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+try:
+    import pptx
+except ImportError:
+    pptx = None
+
+try:
+    import docx
+except ImportError:
+    docx = None
+
+CSV_ROWS_PER_UNIT = 100
+
+
+class Extractor:
+    def __init__(self, suffix: str, unit: str, version: str, units: Callable[[Path], Iterator[str]],
+                 missing: str | None = None):
+        self.suffix = suffix
+        self.unit = unit
+        # Bump the leading number whenever the text produced for the same input changes
+        self.version = version
+        self.units = units
+        # Package to install before this extractor can run, None if it can
+        self.missing = missing
+
+    @property
+    def available(self) -> bool:
+        return self.missing is None
+
+
+EXTRACTORS: dict[str, Extractor] = {}
+
+
+def register(suffix: str, unit: str, version: str, missing: str | None = None):
+    """Register the decorated units(path) function for suffix; missing names the package to install."""
+    def decorate(units):
+        EXTRACTORS[suffix] = Extractor(suffix, unit, version, units, missing)
+        return units
+    return decorate
+
+
+def extractor_for(path: Path) -> Extractor | None:
+    if path.name.endswith("_extracted.txt") or path.name.startswith("~$"):
+        return None  # our own output, and Office lock files
+    return EXTRACTORS.get(path.suffix.lower())
+
+
+def library_version(module) -> str:
+    return getattr(module, "__version__", "?") if module else "missing"
+
+
+@register(".pptx", "slide", f"1/python-pptx-{library_version(pptx)}", None if pptx else "python-pptx")
+def pptx_units(path: Path) -> Iterator[str]:
+    for slide in pptx.Presentation(str(path)).slides:
+        parts = []
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                parts.append(shape.text_frame.text)
+            elif getattr(shape, "has_table", False) and shape.has_table:
+                parts.extend(" | ".join(cell.text for cell in row.cells) for row in shape.table.rows)
+        if slide.has_notes_slide and slide.notes_slide.notes_text_frame is not None:
+            notes = slide.notes_slide.notes_text_frame.text.strip()
+            if notes:
+                parts.append(f"Notes: {notes}")
+        yield "\n".join(p for p in parts if p.strip())
+
+
+@register(".docx", "section", f"1/python-docx-{library_version(docx)}", None if docx else "python-docx")
+def docx_units(path: Path) -> Iterator[str]:
+    """Word has no stored pages; a new section starts at every heading."""
+    document = docx.Document(str(path))
+    section: list[str] = []
+    for paragraph in document.paragraphs:
+        if paragraph.style.name.startswith("Heading") and section:
+            yield "\n".join(section)
+            section = []
+        if paragraph.text.strip():
+            section.append(paragraph.text)
+    for table in document.tables:
+        section.extend(" | ".join(cell.text for cell in row.cells) for row in table.rows)
+    yield "\n".join(section)
+
+
+@register(".ipynb", "cell", "1")
+def notebook_units(path: Path) -> Iterator[str]:
+    notebook = json.loads(path.read_text(encoding="utf-8"))
+    for cell in notebook.get("cells", []):
+        source = cell.get("source", "")
+        text = "".join(source) if isinstance(source, list) else source
+        yield f"```python\n{text}\n```" if cell.get("cell_type") == "code" and text.strip() else text
+
+
+@register(".txt", "page", "1")
+def text_units(path: Path) -> Iterator[str]:
+    # Form feeds are the only page breaks plain text has
+    yield from path.read_text(encoding="utf-8", errors="replace").split("\f")
+
+
+@register(".csv", "block", "1")
+def csv_units(path: Path) -> Iterator[str]:
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        block = []
+        for row in csv.reader(f):
+            block.append(" | ".join(row))
+            if len(block) == CSV_ROWS_PER_UNIT:
+                yield "\n".join(block)
+                block = []
+        if block:
+            yield "\n".join(block)
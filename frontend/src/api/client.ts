@@ -2,13 +2,27 @@ import axios from "axios";
 import type {
   Course,
   Deadline,
+  SearchResult,
+  Snapshot,
   StudyTask,
   TaskCategories,
 } from "../types";
 
-const api = axios.create({ baseURL: import.meta.env.VITE_API_URL || "http://localhost:5001/api" });
+// Signed student token, needed when the backend sets USER_TOKEN_SECRET
+const token = localStorage.getItem("studydash_token");
 
-export const getCourses = () => api.get<Course[]>("/courses").then((r) => r.data);
+const api = axios.create({
+  baseURL: import.meta.env.VITE_API_URL || "http://localhost:5001/api",
+  headers: token ? { Authorization: `Bearer ${token}` } : {},
+});
+
+export const getSnapshot = () => api.get<Snapshot>("/snapshot").then((r) => r.data);
+
+/** Pass fields to fetch only those columns (id always comes back), e.g. getCourses(["name"]). */
+export const getCourses = <K extends keyof Course = keyof Course>(fields?: K[]) =>
+  api
+    .get<Pick<Course, K | "id">[]>("/courses", { params: fields && { fields: fields.join(",") } })
+    .then((r) => r.data);
 
 export const getCourse = (id: string) =>
   api.get<Course>(`/course/${id}`).then((r) => r.data);
@@ -48,3 +62,10 @@ export const updateStudyTask = (
 
 export const deleteStudyTask = (id: string) =>
   api.delete(`/study-tasks/${id}`).then((r) => r.data);
+
+export const search = (q: string, courseId?: string) =>
+  api
+    .get<{ query: string; results: SearchResult[]; took_ms: number }>("/search", {
+      params: { q, course_id: courseId },
+    })
+    .then((r) => r.data);
@@ -7,10 +7,8 @@ import {
   Clock,
 } from "lucide-react";
 import {
-  getCourses,
-  getDeadlines,
+  getSnapshot,
   toggleDeadline,
-  getStudyTasks,
   toggleStudyTask,
   addStudyTask,
   deleteStudyTask,
@@ -29,9 +27,9 @@ export default function Dashboard() {
   const nav = useNavigate();
 
   const reload = useCallback(() => {
-    getCourses().then(setCourses);
-    getDeadlines().then(setDeadlines);
-    getStudyTasks().then((data) => {
+    getSnapshot().then((data) => {
+      setCourses(data.courses);
+      setDeadlines(data.deadlines);
       setStudyTasks(data.tasks);
       setTaskCategories(data.categories);
     });
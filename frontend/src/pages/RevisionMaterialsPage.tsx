@@ -12,13 +12,13 @@ const COURSE_COLORS: Record<string, string> = {
 type TabType = "all" | "overdue" | "in_progress" | "done";
 
 export default function RevisionMaterialsPage() {
-  const [courses, setCourses] = useState<Course[]>([]);
+  const [courses, setCourses] = useState<Pick<Course, "id" | "name">[]>([]);
   const [studyTasks, setStudyTasks] = useState<StudyTask[]>([]);
   const [tab, setTab] = useState<TabType>("all");
 
   const loadData = async () => {
     const [courseList, taskResult] = await Promise.all([
-      getCourses(), getStudyTasks(),
+      getCourses(["name"]), getStudyTasks(),
     ]);
     setCourses(courseList);
     setStudyTasks(taskResult.tasks);
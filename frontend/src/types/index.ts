@@ -61,3 +61,21 @@ export interface TaskCategory {
 }
 
 export type TaskCategories = Record<string, TaskCategory>;
+
+export interface SearchResult {
+  kind: "material" | "week" | "task";
+  course_id: string;
+  ref: string;
+  title: string;
+  snippet: string;
+  score: number;
+}
+
+export interface Snapshot {
+  courses: Course[];
+  deadlines: Deadline[];
+  tasks: StudyTask[];
+  categories: TaskCategories;
+  projects: Record<string, unknown>;
+  took_ms: number;
+}
@@ -1,38 +1,449 @@
-"""Extract text from PDFs in 000/ for summarization. Usage: python read_pdf.py [filename] (default: 01.pdf)"""
+"""Extract text from PDFs and other course material for summarization.
+
+Usage:
+    python read_pdf.py [filename]            one PDF (default: 01.pdf) -> 000/<stem>_extracted.txt
+    python read_pdf.py --batch [DIR ...]     every supported file under DIRs (default: 000/ and
+                                             backend/materials/), written next to it as
+                                             <stem>_extracted.txt (PDF) or <name>_extracted.txt
+
+Besides PDF, the batch handles every type registered in extractors.py (PPTX,
+DOCX, notebooks, text, CSV). All of them share one output format: each page,
+slide, cell or section starts with a marker line such as "[slide 3]".
+
+Extracted PDF pages are cached in .extract_cache.sqlite, keyed by page content
+hash and extractor version. Unchanged files are skipped entirely and an
+updated deck only re-extracts the pages that changed. Pass --force to ignore
+the cache.
+
+Text is streamed to the output page by page from a memory-mapped PDF, and
+extraction stops as soon as --max-chars (default 80000) or --max-pages is hit.
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import sqlite3
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
+import extractors
+
 # Support running from project root or backend
 root = Path(__file__).resolve().parent
-name = sys.argv[1] if len(sys.argv) > 1 else "01.pdf"
-pdf_path = root / "000" / name
-if not pdf_path.exists():
-    pdf_path = root / name
-if not pdf_path.exists():
-    print(f"PDF not found: {name}", file=sys.stderr)
-    sys.exit(1)
+DEFAULT_DIRS = [root / "000", root / "backend" / "materials"]
+CACHE_PATH = root / ".extract_cache.sqlite"
+MAX_LEN = 80000
+# PDFs longer than this are split into page ranges so several workers share them
+PAGES_PER_CHUNK = 40
+TRUNCATED_MARK = "\n\n[... truncated ...]"
 
 try:
+    import PyPDF2
     from PyPDF2 import PdfReader
 except ImportError:
     print("PyPDF2 not installed. Run: pip install PyPDF2", file=sys.stderr)
     sys.exit(1)
 
-reader = PdfReader(str(pdf_path))
-text_parts = []
-for i, page in enumerate(reader.pages):
-    t = page.extract_text()
-    if t:
-        text_parts.append(t)
-
-full_text = "\n\n".join(text_parts)
-# Write to file to avoid console encoding issues (UTF-8)
-stem = Path(name).stem
-out_path = root / "000" / f"{stem}_extracted.txt"
-out_path.parent.mkdir(parents=True, exist_ok=True)
-max_len = 80000
-with open(out_path, "w", encoding="utf-8") as f:
-    f.write(full_text[:max_len])
-    if len(full_text) > max_len:
-        f.write("\n\n[... truncated ...]")
-print(f"Extracted {len(full_text)} chars to {out_path}")
+# Bump the leading number whenever extraction output changes for the same input
+EXTRACTOR_VERSION = f"1/PyPDF2-{PyPDF2.__version__}"
+# Bump when the layout of _extracted.txt files changes; 2 added unit markers
+OUTPUT_FORMAT = 2
+
+
+class ExtractionCache:
+    """Sidecar SQLite index of per-document hashes and per-page extracted text."""
+
+    def __init__(self, path: Path = CACHE_PATH, readonly: bool = False):
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            return
+        self.conn = sqlite3.connect(str(path))
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                path TEXT PRIMARY KEY, sha256 TEXT NOT NULL, version TEXT NOT NULL,
+                pages INTEGER, chars INTEGER, output TEXT
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                page_hash TEXT NOT NULL, version TEXT NOT NULL, text TEXT NOT NULL,
+                PRIMARY KEY (page_hash, version)
+            );
+        """)
+        try:
+            self.conn.execute("ALTER TABLE documents ADD COLUMN budget TEXT")
+        except sqlite3.OperationalError:
+            pass
+        # Page text from older extractor versions can never be hit again
+        self.conn.execute("DELETE FROM pages WHERE version != ?", (EXTRACTOR_VERSION,))
+        self.conn.commit()
+
+    def is_current(self, pdf_path: Path, sha256: str, budget: str, version: str) -> bool:
+        row = self.conn.execute(
+            "SELECT sha256, version, budget, output FROM documents WHERE path = ?", (str(pdf_path),)
+        ).fetchone()
+        return bool(row) and row[:3] == (sha256, version, budget) and Path(row[3]).exists()
+
+    def get_page(self, page_hash: str) -> str | None:
+        row = self.conn.execute(
+            "SELECT text FROM pages WHERE page_hash = ? AND version = ?", (page_hash, EXTRACTOR_VERSION)
+        ).fetchone()
+        return row[0] if row else None
+
+    def add_pages(self, pages: list[tuple[str, str, bool]]):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO pages (page_hash, version, text) VALUES (?, ?, ?)",
+            [(h, EXTRACTOR_VERSION, text) for h, text, cached in pages if not cached],
+        )
+
+    def record(self, pdf_path: Path, sha256: str, budget: str, version: str, pages: int, chars: int,
+               out_path: Path):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO documents (path, sha256, version, budget, pages, chars, output) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (str(pdf_path), sha256, version, budget, pages, chars, str(out_path)),
+        )
+        self.conn.commit()
+
+
+class PageWriter:
+    """Stream page texts to out_path, each under a "[page N]" marker, until the char or page budget is spent."""
+
+    def __init__(self, out_path: Path, max_chars: int = MAX_LEN, max_pages: int = 0, unit: str = "page"):
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to file to avoid console encoding issues (UTF-8)
+        self.f = open(out_path, "w", encoding="utf-8")
+        self.max_chars = max_chars
+        self.max_pages = max_pages
+        self.unit = unit
+        self.chars = 0
+        self.pages = 0
+        self.truncated = False
+
+    @property
+    def full(self) -> bool:
+        return self.truncated or bool(self.max_pages and self.pages >= self.max_pages)
+
+    def add(self, text: str) -> bool:
+        """Write one page; returns False once no further pages are wanted."""
+        if text.strip():
+            piece = ("\n\n" if self.chars else "") + f"[{self.unit} {self.pages + 1}]\n" + text
+            room = self.max_chars - self.chars if self.max_chars else len(piece)
+            self.f.write(piece[:room])
+            self.chars += min(room, len(piece))
+            self.truncated = len(piece) > room
+        self.pages += 1
+        return not self.full
+
+    def close(self, pages_left: bool):
+        if self.truncated or (self.full and pages_left):
+            self.f.write(TRUNCATED_MARK)
+        self.f.close()
+
+
+@contextmanager
+def open_pdf(pdf_path: str):
+    """PdfReader over a read-only memory map, so the file is paged in on demand."""
+    with open(pdf_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        yield PdfReader(mm)
+
+
+def file_sha256(pdf_path: str) -> str:
+    h = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def page_hash(page) -> str:
+    """Fingerprint a page by its content stream and the fonts it draws with."""
+    h = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        h.update(contents.get_data())
+    fonts = (page.get("/Resources") or {}).get("/Font") or {}
+    for name in sorted(fonts):
+        h.update(f"{name}={fonts[name].get_object().get('/BaseFont')};".encode())
+    return h.hexdigest()
+
+
+def count_pages(pdf_path: str) -> int:
+    with open_pdf(pdf_path) as reader:
+        return len(reader.pages)
+
+
+def iter_pages(reader, start: int, stop: int, cache: ExtractionCache | None = None):
+    """Yield (page_hash, text, cached) for pages [start, stop) one at a time."""
+    for i in range(start, stop):
+        page = reader.pages[i]
+        h = page_hash(page)
+        text = cache.get_page(h) if cache else None
+        yield (h, text, True) if text is not None else (h, page.extract_text() or "", False)
+
+
+def extract_pages(pdf_path: str, start: int, stop: int, use_cache: bool = True,
+                  max_chars: int = 0) -> list[tuple[str, str, bool]]:
+    """Extract pages [start, stop) of one PDF as (page_hash, text, cached) tuples.
+
+    Runs inside a worker process; cached pages are read from the sidecar index
+    and only the rest go through extract_text(). No range needs more than
+    max_chars of text, so the worker stops early once it has that much.
+    """
+    cache = ExtractionCache(readonly=True) if use_cache and CACHE_PATH.exists() else None
+    pages, chars = [], 0
+    try:
+        with open_pdf(pdf_path) as reader:
+            for p in iter_pages(reader, start, stop, cache):
+                pages.append(p)
+                chars += len(p[1])
+                if max_chars and chars > max_chars:
+                    break
+    finally:
+        if cache:
+            cache.conn.close()
+    return pages
+
+
+def pdf_units(path: Path):
+    with open_pdf(str(path)) as reader:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+
+
+# Batches split PDFs into page ranges instead of calling pdf_units (see extract_batch)
+extractors.register(".pdf", "page", EXTRACTOR_VERSION)(pdf_units)
+
+
+def document_version(extractor: extractors.Extractor) -> str:
+    return f"{extractor.version}/out{OUTPUT_FORMAT}"
+
+
+def output_path(path: Path) -> Path:
+    """deck.pdf -> deck_extracted.txt; other types keep their suffix so deck.pptx doesn't collide."""
+    return path.with_name(f"{path.stem if path.suffix.lower() == '.pdf' else path.name}_extracted.txt")
+
+
+def extract_units(path: str, max_chars: int = 0, max_pages: int = 0) -> tuple[list[str], bool]:
+    """Extract a non-PDF file in a worker; returns (unit texts within the budget, whether more were left)."""
+    units, chars = [], 0
+    source = extractors.extractor_for(Path(path)).units(Path(path))
+    for text in source:
+        if (max_chars and chars > max_chars) or (max_pages and len(units) >= max_pages):
+            return units, True
+        units.append(text)
+        chars += len(text)
+    return units, False
+
+
+def timed(fn, *args):
+    """Run fn in a worker and return (result, seconds) so the batch can keep per-type throughput."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def budget_key(max_chars: int, max_pages: int) -> str:
+    return f"chars={max_chars},pages={max_pages}"
+
+
+def extract_one(name: str, force: bool = False, max_chars: int = MAX_LEN, max_pages: int = 0):
+    pdf_path = root / "000" / name
+    if not pdf_path.exists():
+        pdf_path = root / name
+    if not pdf_path.exists():
+        print(f"PDF not found: {name}", file=sys.stderr)
+        sys.exit(1)
+
+    pdf_path = pdf_path.resolve()
+    if pdf_path.stat().st_size == 0:
+        print(f"Empty file, skipping: {pdf_path}", file=sys.stderr)
+        return
+    out_path = root / "000" / f"{Path(name).stem}_extracted.txt"
+    cache = ExtractionCache()
+    sha = file_sha256(str(pdf_path))
+    budget = budget_key(max_chars, max_pages)
+    version = document_version(extractors.EXTRACTORS[".pdf"])
+    if not force and cache.is_current(pdf_path, sha, budget, version) and out_path.exists():
+        print(f"Unchanged, keeping {out_path}")
+        return
+
+    writer = PageWriter(out_path, max_chars, max_pages)
+    reused = 0
+    with open_pdf(str(pdf_path)) as reader:
+        total = len(reader.pages)
+        for p in iter_pages(reader, 0, total, None if force else cache):
+            cache.add_pages([p])
+            reused += p[2]
+            if not writer.add(p[1]):
+                break
+    writer.close(pages_left=writer.pages < total)
+    cache.record(pdf_path, sha, budget, version, writer.pages, writer.chars, out_path)
+    print(f"Extracted {writer.chars} chars from {writer.pages}/{total} pages to {out_path} "
+          f"({reused} pages from cache)")
+
+
+def page_ranges(n: int, workers: int) -> list[tuple[int, int]]:
+    """Split n pages into contiguous ranges; small PDFs stay in one range."""
+    size = max(PAGES_PER_CHUNK, -(-n // workers)) if n > PAGES_PER_CHUNK else max(n, 1)
+    return [(start, min(start + size, n)) for start in range(0, n, size)]
+
+
+class TypeStats:
+    """Throughput of one file type; seconds are summed worker time, so rates are per worker."""
+
+    def __init__(self):
+        self.files = self.units = self.cached_units = self.chars = self.bytes = 0
+        self.seconds = 0.0
+
+    def to_dict(self) -> dict:
+        fresh = self.units - self.cached_units
+        return {
+            "files": self.files, "units": self.units, "cached_units": self.cached_units, "chars": self.chars,
+            "mb": round(self.bytes / (1024 * 1024), 3), "seconds": round(self.seconds, 3),
+            "units_per_s": round(fresh / self.seconds, 1) if self.seconds else 0.0,
+            "mb_per_s": round(self.bytes / (1024 * 1024) / self.seconds, 3) if self.seconds else 0.0,
+        }
+
+
+def extract_batch(dirs: list[Path], workers: int, force: bool = False,
+                  max_chars: int = MAX_LEN, max_pages: int = 0, progress=None) -> dict:
+    """Extract every supported file under dirs. progress(done, total) is called after each file;
+    an exception raised from it aborts the batch and cancels outstanding work."""
+    files = sorted({p.resolve() for d in dirs if d.is_dir() for p in d.rglob("*")
+                    if extractors.extractor_for(p) and p.is_file()})
+    unavailable: dict[str, list[Path]] = {}
+    for path in files:
+        extractor = extractors.extractor_for(path)
+        if not extractor.available:
+            unavailable.setdefault(extractor.missing, []).append(path)
+    for package, paths in unavailable.items():
+        print(f"Skipping {len(paths)} file(s) that need {package} (pip install {package})", file=sys.stderr)
+    files = [path for path in files if extractors.extractor_for(path).available]
+    # Nothing to extract from 0-byte files, and open_pdf can't mmap them
+    empty = [path for path in files if path.stat().st_size == 0]
+    if empty:
+        print(f"Skipping {len(empty)} empty file(s)", file=sys.stderr)
+        files = [path for path in files if path not in empty]
+    pdfs = [path for path in files if path.suffix.lower() == ".pdf"]
+    if not files:
+        print("No files to extract.")
+        return {"files": 0, "pdfs": 0, "extracted": 0, "skipped": 0, "unavailable": 0, "empty": len(empty),
+                "pages": 0, "cached_pages": 0, "seconds": 0.0, "types": {}}
+
+    start = time.perf_counter()
+    cache = ExtractionCache()
+    budget = budget_key(max_chars, max_pages)
+    total_pages = reused_pages = 0
+    done = []
+    types: dict[str, TypeStats] = {}
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        hashes = dict(zip(files, pool.map(file_sha256, map(str, files))))
+        changed = [
+            path for path in files
+            if force or not cache.is_current(path, hashes[path], budget,
+                                             document_version(extractors.extractor_for(path)))
+        ]
+        skipped = len(files) - len(changed)
+
+        counts = {}
+        for pdf, fut in [(pdf, pool.submit(count_pages, str(pdf))) for pdf in changed if pdf in pdfs]:
+            try:
+                counts[pdf] = fut.result()
+            except Exception as e:
+                print(f"  Failed: {pdf} ({e})", file=sys.stderr)
+
+        # Submit everything up front so large and small files interleave across workers.
+        # PDFs are split into page ranges (ranges past the page budget are never needed);
+        # other types are one task each and report whether units were left over.
+        pending = []
+        for path in changed:
+            if path.suffix.lower() != ".pdf":
+                pending.append((path, None, [pool.submit(timed, extract_units, str(path), max_chars, max_pages)]))
+            elif path in counts:
+                n = counts[path]
+                pending.append((path, n, [
+                    pool.submit(timed, extract_pages, str(path), a, b, not force, max_chars)
+                    for a, b in page_ranges(min(n, max_pages) if max_pages else n, workers)
+                ]))
+        for i, (path, n, futures) in enumerate(pending, 1):
+            extractor = extractors.extractor_for(path)
+            stats = types.setdefault(extractor.suffix.lstrip("."), TypeStats())
+            out_path = output_path(path)
+            writer = PageWriter(out_path, max_chars, max_pages, extractor.unit)
+            reused = 0
+            try:
+                for fut in futures:
+                    if writer.full:
+                        fut.cancel()
+                        continue
+                    result, seconds = fut.result()
+                    stats.seconds += seconds
+                    if n is None:
+                        units, more = result
+                        n = len(units) + more
+                        result = [(None, text, False) for text in units]
+                    for p in result:
+                        if p[0] is not None:
+                            cache.add_pages([p])
+                        reused += p[2]
+                        if not writer.add(p[1]):
+                            break
+            except Exception as e:
+                print(f"  Failed: {path} ({e})", file=sys.stderr)
+                for fut in futures:
+                    fut.cancel()
+                continue
+            finally:
+                writer.close(pages_left=n is not None and writer.pages < n)
+            cache.record(path, hashes[path], budget, document_version(extractor), writer.pages, writer.chars,
+                         out_path)
+            total_pages += writer.pages
+            reused_pages += reused
+            stats.files += 1
+            stats.units += writer.pages
+            stats.cached_units += reused
+            stats.chars += writer.chars
+            stats.bytes += path.stat().st_size
+            done.append(path)
+            print(f"  {path.relative_to(root) if path.is_relative_to(root) else path}: "
+                  f"{writer.pages}/{n} {extractor.unit}s ({reused} cached), {writer.chars} chars")
+            if progress:
+                progress(i, len(pending))
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    rate = (total_pages - reused_pages) / elapsed if elapsed else 0.0
+    print(f"Extracted {len(done)} file(s), skipped {skipped} unchanged; {total_pages} pages/units "
+          f"({reused_pages} from cache) in {elapsed:.1f}s ({rate:.1f} units/s, {workers} workers)")
+    for suffix, stats in sorted(types.items()):
+        t = stats.to_dict()
+        print(f"  {suffix:<6}{t['files']:>5} files {t['units']:>7} units {t['mb']:>9.2f} MB  "
+              f"{t['units_per_s']:>8.1f} units/s {t['mb_per_s']:>8.2f} MB/s per worker")
+    return {"files": len(files), "pdfs": len(pdfs), "extracted": len(done), "skipped": skipped,
+            "unavailable": sum(len(paths) for paths in unavailable.values()), "empty": len(empty),
+            "pages": total_pages, "cached_pages": reused_pages, "seconds": round(elapsed, 3),
+            "types": {suffix: stats.to_dict() for suffix, stats in types.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("name", nargs="?", default="01.pdf", help="PDF in 000/ (single-file mode)")
+    parser.add_argument("--batch", nargs="*", type=Path, metavar="DIR", help="extract every supported file under DIRs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="ignore the extraction cache")
+    parser.add_argument("--max-chars", type=int, default=MAX_LEN, help="stop after this many characters (0 = no limit)")
+    parser.add_argument("--max-pages", type=int, default=0, help="stop after this many pages (0 = no limit)")
+    args = parser.parse_args()
+
+    if args.batch is not None:
+        extract_batch(args.batch or DEFAULT_DIRS, max(1, args.workers), args.force, args.max_chars, args.max_pages)
+    else:
+        extract_one(args.name, args.force, args.max_chars, args.max_pages)
+
+
+if __name__ == "__main__":
+    main()